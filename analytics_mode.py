@@ -0,0 +1,61 @@
+import time
+import streamlit as st
+from utils.analytics import get_analytics
+from utils.profiling import timed
+
+
+def _columns(rows, *names):
+    return {name: [row[name] for row in rows] for name in names}
+
+
+@timed("render.analytics")
+def run_analytics_mode(bank):
+    st.title("📊 Mistake Analytics")
+
+    analytics = get_analytics(bank)
+    summary = analytics.summary()
+    if not summary["attempts"]:
+        st.info("No answers logged yet. Practice a few questions and come back.")
+        return
+
+    col1, col2, col3 = st.columns(3)
+    col1.metric("Answers", summary["attempts"])
+    col2.metric("Wrong", summary["errors"])
+    col3.metric("Error rate", f"{summary['error_rate']:.0%}")
+
+    # ─── Error rate per day and per option ───────────────────────────────
+    st.subheader("Error rate per day")
+    per_day = [row for row in analytics.per_day() if row["attempts"]]
+    st.bar_chart(_columns(per_day, "day", "error_rate"), x="day", y="error_rate")
+
+    st.subheader("Error rate per option")
+    st.caption("A wrong option picked, or a correct one left out.")
+    st.bar_chart(_columns(analytics.per_option(), "option", "error_rate"), x="option", y="error_rate")
+
+    # ─── Trend ───────────────────────────────────────────────────────────
+    trend = analytics.trend()
+    if len(trend) > 1:
+        st.subheader("Trend")
+        dates = [time.strftime("%Y-%m-%d", time.localtime(row["start"])) for row in trend]
+        st.line_chart({"date": dates, "error_rate": [row["error_rate"] for row in trend]},
+                      x="date", y="error_rate")
+
+    # ─── Hardest questions and confused distractors ──────────────────────
+    st.subheader("Hardest questions")
+    hardest = analytics.hardest()
+    if hardest:
+        st.dataframe([{"Question": row["label"], "Text": bank.card(row["gid"]).question,
+                       "Attempts": row["attempts"], "Wrong": row["errors"],
+                       "Error rate": f"{row['error_rate']:.0%}"} for row in hardest],
+                     use_container_width=True)
+    else:
+        st.caption("Needs at least two answers per question.")
+
+    st.subheader("Most confused distractors")
+    confused = analytics.confused()
+    if confused:
+        st.dataframe([{"Question": row["label"], "Picked": f"{row['option']}: {bank[row['gid']]['options'][row['option']]}",
+                       "Correct": ", ".join(bank.answer_letters(row["gid"])), "Times": row["picks"]}
+                      for row in confused], use_container_width=True)
+    else:
+        st.caption("No wrong options picked yet.")
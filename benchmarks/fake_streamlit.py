@@ -0,0 +1,167 @@
+# Minimal stand-in for the parts of the Streamlit API the modes use, so the
+# benchmark can drive them headlessly and offline. Each simulated learner
+# runs in its own thread with its own session state: widgets read their
+# value from it (the learner sets it before a run), buttons report whether
+# the learner "clicked" them, and output elements are recorded.
+import sys
+import threading
+import types
+
+
+class RerunException(Exception):
+    """Raised by st.rerun(); the driver starts the next run."""
+
+
+class SessionState(dict):
+    def __getattr__(self, key):
+        try:
+            return self[key]
+        except KeyError:
+            raise AttributeError(key) from None
+
+    def __setattr__(self, key, value):
+        self[key] = value
+
+    def __delattr__(self, key):
+        try:
+            del self[key]
+        except KeyError:
+            raise AttributeError(key) from None
+
+
+class Page:
+    """Everything one script run rendered."""
+
+    def __init__(self):
+        self.elements = []      # (kind, text)
+        self.checkboxes = []    # (label, key)
+        self.multiselects = []  # (label, options, key)
+        self.buttons = []       # labels
+
+    def texts(self, kind):
+        return [text for k, text in self.elements if k == kind]
+
+
+class _Session(threading.local):
+    def __init__(self):
+        self.state = SessionState()
+        self.query_params = {}
+        self.page = Page()
+        self.clicks = set()
+
+
+_session = _Session()
+
+
+class _Block:
+    """Context-manager container (columns, forms, the sidebar)."""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def __getattr__(self, name):
+        return getattr(_module, name)
+
+
+def _record(kind):
+    def element(body="", *args, **kwargs):
+        _session.page.elements.append((kind, str(body)))
+    return element
+
+
+def _widget_value(key, default):
+    state = _session.state
+    if key is None:
+        return default
+    if key not in state:
+        state[key] = default
+    return state[key]
+
+
+def checkbox(label, value=False, key=None, **kwargs):
+    _session.page.checkboxes.append((label, key))
+    return bool(_widget_value(key, value))
+
+
+def multiselect(label, options, default=None, key=None, **kwargs):
+    _session.page.multiselects.append((label, list(options), key))
+    return list(_widget_value(key, list(default or [])))
+
+
+def selectbox(label, options, index=0, key=None, **kwargs):
+    options = list(options)
+    return _widget_value(key, options[index] if options else None)
+
+
+def radio(label, options, index=0, key=None, **kwargs):
+    return selectbox(label, options, index, key)
+
+
+def number_input(label, min_value=None, max_value=None, value=None, key=None, **kwargs):
+    default = value if value is not None else (min_value if min_value is not None else 0)
+    return _widget_value(key, default)
+
+
+def button(label, key=None, **kwargs):
+    _session.page.buttons.append(label)
+    return label in _session.clicks
+
+
+def form_submit_button(label="Submit", **kwargs):
+    return button(label)
+
+
+def columns(spec, **kwargs):
+    count = spec if isinstance(spec, int) else len(spec)
+    return [_Block() for _ in range(count)]
+
+
+def form(key, **kwargs):
+    return _Block()
+
+
+def rerun():
+    raise RerunException()
+
+
+def set_page_config(**kwargs):
+    pass
+
+
+def begin_run(clicks=()):
+    """Starts a script run in the current thread; returns its Page."""
+    _session.page = Page()
+    _session.clicks = set(clicks)
+    return _session.page
+
+
+def reset_session():
+    _session.state = SessionState()
+    _session.query_params = {}
+
+
+_module = types.ModuleType("streamlit")
+for _name in ("title", "header", "subheader", "markdown", "write", "info", "success",
+              "warning", "error", "caption", "progress"):
+    setattr(_module, _name, _record(_name))
+for _fn in (checkbox, multiselect, selectbox, radio, number_input, button,
+            form_submit_button, columns, form, rerun, set_page_config):
+    setattr(_module, _fn.__name__, _fn)
+_module.experimental_rerun = rerun
+_module.sidebar = _Block()
+
+
+# st.session_state / st.query_params resolve to the calling thread's session
+_module.__class__ = type("FakeStreamlit", (types.ModuleType,), {
+    "session_state": property(lambda self: _session.state),
+    "query_params": property(lambda self: _session.query_params),
+})
+
+
+def install():
+    """Makes `import streamlit` return this stub."""
+    sys.modules["streamlit"] = _module
+    return _module
@@ -0,0 +1,319 @@
+import argparse
+import json
+import os
+import random
+import shutil
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from collections import defaultdict
+
+from benchmarks import fake_streamlit
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DAY_MISTAKES = "day_practice/data/day_mistakes.json"
+BULK_MISTAKES = "bulk_practice/data/bulk_mistakes.json"
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100.0 * (len(ordered) - 1))))]
+
+
+class Stats:
+    """Measurements shared by all learner threads."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latencies = defaultdict(list)
+        self.answers = 0
+        self.expected_mistakes = defaultdict(int)
+        self.bytes_written = 0
+        self.errors = []
+
+    def add(self, mode, seconds):
+        with self.lock:
+            self.latencies[mode].append(seconds)
+
+
+class Learner:
+    """One simulated user clicking through the modes like a person would."""
+
+    def __init__(self, user, app, stats, accuracy, think, seed, answers_per_mode):
+        self.user = user
+        self.app = app
+        self.stats = stats
+        self.accuracy = accuracy
+        self.think = think
+        self.rng = random.Random(seed)
+        self.answers_per_mode = answers_per_mode
+        self.expected = defaultdict(int)
+        self.answered = 0
+
+    # ─── Driving single script runs ──────────────────────────────────────
+    def run(self, mode, fn, *args, clicks=()):
+        if self.think:
+            time.sleep(self.rng.expovariate(1.0 / self.think))
+        page = fake_streamlit.begin_run(clicks)
+        start = time.perf_counter()
+        try:
+            fn(*args)
+        except fake_streamlit.RerunException:
+            pass
+        self.stats.add(mode, time.perf_counter() - start)
+        return page
+
+    def _pick(self, letters, correct):
+        """Returns the letters to tick: the right ones with probability `accuracy`."""
+        if self.rng.random() < self.accuracy:
+            return set(correct)
+        wrong = set(correct) ^ {self.rng.choice(letters)}
+        return wrong or {letters[0]} ^ set(correct) or set(letters)
+
+    def answer_cards(self, mode, fn, args, submit, next_, restart, mistakes_file):
+        """Answers up to answers_per_mode checkbox cards of one mode."""
+        answered = 0
+        for _ in range(self.answers_per_mode * 4):
+            if answered >= self.answers_per_mode:
+                break
+            page = self.run(mode, fn, *args)
+            if not page.checkboxes:
+                if restart in page.buttons:
+                    self.run(mode, fn, *args, clicks=[restart])
+                    continue
+                break
+            letters = [label.split(":", 1)[0] for label, _ in page.checkboxes]
+            correct = self.app.answers_for(page)
+            if correct is None:
+                break
+            chosen = self._pick(letters, correct)
+            state = fake_streamlit._session.state
+            for (label, key), letter in zip(page.checkboxes, letters):
+                state[key] = letter in chosen
+            page = self.run(mode, fn, *args, clicks=[submit])
+            if "❌ Incorrect." in page.texts("error"):
+                self.expected[mistakes_file] += 1
+            answered += 1
+            self.run(mode, fn, *args, clicks=[next_])
+        self.answered += answered
+
+    def take_quiz(self, day):
+        questions = self.app.bank.day_questions(day)
+        page = self.run("quiz", self.app.run_quiz_mode, questions, day)
+        state = fake_streamlit._session.state
+        wrong = 0
+        for (label, options, key), q in zip(page.multiselects, questions):
+            chosen = self._pick(options, q["answers"])
+            state[key] = sorted(chosen)
+            wrong += chosen != set(q["answers"])
+        self.run("quiz", self.app.run_quiz_mode, questions, day, clicks=["Submit Quiz"])
+        self.run("quiz", self.app.run_quiz_mode, questions, day)
+        self.run("quiz", self.app.run_quiz_mode, questions, day, clicks=["Reset Quiz"])
+        self.expected[DAY_MISTAKES] += wrong
+        self.answered += len(questions)
+
+    # ─── One study session ───────────────────────────────────────────────
+    def study(self, rounds):
+        app = self.app
+        from utils.users import set_current_user
+        set_current_user(self.user)
+        fake_streamlit.reset_session()
+        try:
+            for _ in range(rounds):
+                day = self.rng.choice(app.bank.days)
+                days = sorted(self.rng.sample(app.bank.days, min(3, app.bank.num_days)))
+                day_questions = app.bank.day_questions(day)
+
+                self.answer_cards("flashcards", app.run_flashcard_mode, (day_questions, day),
+                                  "Submit", "Next", "Start New Round", DAY_MISTAKES)
+                self.run("review", app.run_review_mode, day_questions, day)
+                self.run("mistake_review", app.run_mistake_review_mode, day)
+                self.answer_cards("mistake_practice", app.run_mistake_practice_mode, (day,),
+                                  "Submit Mistake", "Next Mistake", "🔁 Restart Mistake Practice",
+                                  DAY_MISTAKES)
+                self.take_quiz(day)
+
+                fake_streamlit._session.state["bulk_days"] = days
+                self.run("bulk_practice", app.run_bulk_practice_mode, app.bank, days, clicks=["Start"])
+                self.answer_cards("bulk_practice", app.run_bulk_practice_mode, (app.bank, days),
+                                  "Submit", "Next", "Start New Round", BULK_MISTAKES)
+                self.run("bulk_review", app.run_bulk_review_mode, app.bank, days)
+                self.run("bulk_mistake_review", app.show_all_bulk_mistakes)
+                self.answer_cards("bulk_mistakes", app.practice_bulk_mistakes, (),
+                                  "Submit", "Next", "🔁 Restart Practice", BULK_MISTAKES)
+        except Exception as e:  # report, don't hang the other learners
+            with self.stats.lock:
+                self.stats.errors.append(f"{self.user}: {type(e).__name__}: {e}")
+        with self.stats.lock:
+            self.stats.answers += self.answered
+            for path, count in self.expected.items():
+                self.stats.expected_mistakes[(self.user, path)] += count
+
+
+class App:
+    """The mode entry points, imported after the stub and workspace are in place."""
+
+    def __init__(self):
+        from utils.question_bank import get_question_bank
+        from day_practice.day_flashcards import run_flashcard_mode
+        from day_practice.day_review_mode import run_review_mode
+        from day_practice.day_mistakes import run_mistake_review_mode
+        from day_practice.day_mistake_practice import run_mistake_practice_mode
+        from bulk_practice.bulk_practice_mode import run_bulk_practice_mode
+        from bulk_practice.bulk_review_mode import run_bulk_review_mode
+        from bulk_practice.bulk_mistake_tools import show_all_bulk_mistakes, practice_bulk_mistakes
+        from quiz_mode import run_quiz_mode
+
+        self.bank = get_question_bank("questions.json")
+        self.run_flashcard_mode = run_flashcard_mode
+        self.run_review_mode = run_review_mode
+        self.run_mistake_review_mode = run_mistake_review_mode
+        self.run_mistake_practice_mode = run_mistake_practice_mode
+        self.run_bulk_practice_mode = run_bulk_practice_mode
+        self.run_bulk_review_mode = run_bulk_review_mode
+        self.show_all_bulk_mistakes = show_all_bulk_mistakes
+        self.practice_bulk_mistakes = practice_bulk_mistakes
+        self.run_quiz_mode = run_quiz_mode
+        self._answers = {q["question"]: tuple(q["answers"]) for q in self.bank}
+
+    def answers_for(self, page):
+        """Finds the correct answers of the question shown on `page`."""
+        for text in page.texts("markdown"):
+            answers = self._answers.get(text)
+            if answers is not None:
+                return answers
+        return None
+
+
+def prepare_workspace(questions):
+    """Creates a scratch copy of the app's data layout and chdirs into it."""
+    workdir = tempfile.mkdtemp(prefix="study_bench_")
+    shutil.copy(questions, os.path.join(workdir, "questions.json"))
+    for directory in ("day_practice/data", "bulk_practice/data", "data"):
+        os.makedirs(os.path.join(workdir, directory))
+    os.chdir(workdir)
+    return workdir
+
+
+def instrument_writes(stats):
+    """Counts the bytes the JSON store writes to disk."""
+    import utils.store
+
+    original = utils.store.atomic_write_json
+
+    def counting_write(path, data):
+        original(path, data)
+        size = os.path.getsize(path)
+        with stats.lock:
+            stats.bytes_written += size
+
+    utils.store.atomic_write_json = counting_write
+
+
+def count_logged_mistakes(users):
+    """Reads back every user's mistake counters after a final compaction and flush."""
+    from utils.users import set_current_user
+    from utils.utils import store, load_json, flush_json
+    from utils.attempts import compact_all
+
+    compact_all()
+    flush_json()
+    store.invalidate()
+    logged = {}
+    for user in users:
+        set_current_user(user)
+        for path in (DAY_MISTAKES, BULK_MISTAKES):
+            logged[(user, path)] = sum(load_json(path, {}).values())
+    return logged
+
+
+def run_benchmark(args):
+    stats = Stats()
+    questions = os.path.abspath(args.questions)
+    workdir = prepare_workspace(questions)
+    if args.storage == "sqlite":
+        os.environ["STUDY_STORAGE"] = "sqlite"
+        os.environ["STUDY_DB"] = os.path.join(workdir, "data", "study.db")
+    sys.path.insert(0, REPO_DIR)
+    fake_streamlit.install()
+
+    tracemalloc.start()
+    app = App()
+    instrument_writes(stats)
+
+    users = ["shared"] * args.users if args.shared_user else [f"learner{i}" for i in range(args.users)]
+    learners = [Learner(user, app, stats, args.accuracy, args.think, args.seed + i, args.answers)
+                for i, user in enumerate(users)]
+    threads = [threading.Thread(target=learner.study, args=(args.rounds,)) for learner in learners]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - start
+
+    logged = count_logged_mistakes(sorted(set(users)))
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    if args.storage == "sqlite":
+        stats.bytes_written = sum(os.path.getsize(os.path.join(workdir, "data", f))
+                                  for f in os.listdir(os.path.join(workdir, "data")))
+    # The attempt log is appended to, not rewritten, so it is counted once at the end
+    stats.bytes_written += sum(os.path.getsize(os.path.join(root, f))
+                               for root, _, files in os.walk(workdir) for f in files if f.endswith(".jsonl"))
+    os.chdir(REPO_DIR)
+    shutil.rmtree(workdir, ignore_errors=True)
+
+    all_latencies = [x for values in stats.latencies.values() for x in values]
+    expected = sum(stats.expected_mistakes.values())
+    return {
+        "users": args.users,
+        "storage": args.storage,
+        "elapsed_s": round(elapsed, 3),
+        "answers": stats.answers,
+        "reruns": len(all_latencies),
+        "rerun_ms": {p: round(percentile(all_latencies, p) * 1000, 3) for p in (50, 90, 95, 99)},
+        "rerun_ms_by_mode": {mode: {p: round(percentile(values, p) * 1000, 3) for p in (50, 95)}
+                             for mode, values in sorted(stats.latencies.items())},
+        "bytes_written_per_answer": round(stats.bytes_written / max(stats.answers, 1), 1),
+        "expected_mistakes": expected,
+        "lost_mistake_updates": expected - sum(logged.values()),
+        "peak_memory_kb": round(peak / 1024, 1),
+        "errors": stats.errors,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Simulate concurrent learners against the study modes.")
+    parser.add_argument("--users", type=int, default=8)
+    parser.add_argument("--rounds", type=int, default=2, help="study sessions per learner")
+    parser.add_argument("--answers", type=int, default=10, help="cards answered per mode and round")
+    parser.add_argument("--accuracy", type=float, default=0.7)
+    parser.add_argument("--think", type=float, default=0.0, help="mean seconds between clicks")
+    parser.add_argument("--storage", choices=["json", "sqlite"], default="json")
+    parser.add_argument("--shared-user", action="store_true", help="all learners write the same user's files")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--questions", default=os.path.join(REPO_DIR, "questions.json"))
+    parser.add_argument("--json", dest="json_out", help="also write the report to this file")
+    parser.add_argument("--max-p95-ms", type=float, help="fail if the p95 rerun latency is higher")
+    args = parser.parse_args(argv)
+
+    report = run_benchmark(args)
+    print(json.dumps(report, indent=2, ensure_ascii=False))
+    if args.json_out:
+        with open(args.json_out, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+
+    failed = bool(report["errors"]) or report["lost_mistake_updates"] != 0
+    if args.max_p95_ms is not None and report["rerun_ms"][95] > args.max_p95_ms:
+        failed = True
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    # python -m benchmarks.learners --users 20 --rounds 3 --think 0.02 --max-p95-ms 50
+    sys.exit(main())
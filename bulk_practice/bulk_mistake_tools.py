@@ -2,125 +2,128 @@ import streamlit as st
 import sys
 sys.path.append(".")
 from utils.utils import load_json
+from utils.question_bank import get_question_bank
+from utils.scheduler import session_scheduler
+from utils.paging import render_pager
+from utils.grading import grade
+from utils.attempts import record_attempt, card_timer
+from utils.session import mode_state
+from utils.profiling import timed, phase
 
 DATA_DIR = "bulk_practice/data/"
 BULK_MISTAKES_FILE = DATA_DIR + "bulk_mistakes.json"
-QUESTIONS_FILE = "questions.json"
+QUESTIONS_FILE = None  # the current bank (see utils.bank_registry)
 
+@timed("render.bulk_mistake_review")
 def show_all_bulk_mistakes(mistakes_file=BULK_MISTAKES_FILE, questions_file=QUESTIONS_FILE):
     st.header("All Bulk Practice Mistakes")
     mistakes = load_json(mistakes_file, {})
-    all_questions = load_json(questions_file, [])
+    bank = get_question_bank(questions_file)
 
     if not mistakes:
         st.info("No bulk practice mistakes recorded yet.")
         return
 
-    for key, count in mistakes.items():
+    # Near-duplicates (see utils.dedup) are listed once, under the canonical question
+    entries = list(bank.mistakes_by_gid(mistakes).items())
+    start, end = render_pager(len(entries), "bulk_mistake_review")
+    for gid, count in entries[start:end]:
         try:
-            day, qidx = key.replace("day", "").split("_q")
-            day = int(day)
-            qidx = int(qidx)
-            question_idx = (day - 1) * 40 + qidx
-            q = all_questions[question_idx]
+            day, qidx = bank.locate(gid)
+            st.markdown(bank.card(gid).markdown(
+                f"Day {day} Q{qidx+1}.", f"\n\n:orange[❌ You answered this wrong {count} time(s).]"))
 
-            st.markdown(f"**Day {day} Q{qidx+1}.** {q['question']}")
-            st.info(q["instruction"])
-
-            for k, v in q["options"].items():
-                st.markdown(f"- {k}: {v}")
-
-            correct_answers = q["answers"]  # Keep original order
-            sorted_answers = sorted(correct_answers)  # Sort for display only
-            st.success("✅ Correct Answer(s): " + ", ".join(sorted_answers))
-            st.warning(f"❌ You answered this wrong {count} time(s).")
-
-            st.markdown("---")
-            
         except Exception as e:
-            st.error(f"Error processing question {key}: {e}")
+            st.error(f"Error processing question {gid}: {e}")
             continue
 
+@timed("render.bulk_mistake_practice")
 def practice_bulk_mistakes(mistakes_file=BULK_MISTAKES_FILE, questions_file=QUESTIONS_FILE):
     st.header("Practice Bulk Mistakes")
-    mistakes = load_json(mistakes_file, {})
-    all_questions = load_json(questions_file, [])
-    mistake_keys = list(mistakes.keys())
-    
-    if not mistake_keys:
+    with phase("bulk_mistake_practice.load"):
+        mistakes = load_json(mistakes_file, {})
+    bank = get_question_bank(questions_file)
+    scheduler = session_scheduler(st.session_state)
+    state = mode_state(st.session_state, "bulk_mistakes")
+
+    if not mistakes:
         st.info("No bulk mistakes to practice!")
         return
 
-    if "bulk_mistake_idx" not in st.session_state:
-        st.session_state.bulk_mistake_idx = 0
-        st.session_state.bulk_mistake_correct = 0
-        st.session_state.bulk_mistake_submitted = False
+    # Due and most-missed questions first; the order is fixed for the round
+    # (rebuilt whenever the set of mistaken questions changed, e.g. after a clear)
+    miss_counts = bank.mistakes_by_gid(mistakes)
+    practice_gids = sorted(miss_counts)
+    if "order" not in state or state.get("gids") != practice_gids:
+        state.reset_widgets()
+        state.gids = practice_gids
+        state.order = scheduler.order(practice_gids, priority=miss_counts)
+        state.idx = 0
+        state.correct = 0
+        state.submitted = False
+    mistake_gids = state.order
+
+    if not mistake_gids:
+        st.info("No bulk mistakes to practice!")
+        return
 
-    idx = st.session_state.bulk_mistake_idx
-    total = len(mistake_keys)
+    idx = state.idx
+    total = len(mistake_gids)
 
     # Show completion message when finished
     if idx >= total:
-        accuracy = (st.session_state.bulk_mistake_correct / total) * 100 if total > 0 else 0
+        accuracy = (state.correct / total) * 100 if total > 0 else 0
         st.success(f"🎉 You've practiced all {total} mistaken questions!")
         st.markdown(f"**Your practice accuracy:** {accuracy:.1f}%")
         if st.button("🔁 Restart Practice"):
-            st.session_state.bulk_mistake_idx = 0
-            st.session_state.bulk_mistake_correct = 0
-            st.session_state.bulk_mistake_submitted = False
+            state.clear()
             st.rerun()
         return
 
-    key = mistake_keys[idx]
+    gid = mistake_gids[idx]
     try:
-        day, qidx = key.replace("day", "").split("_q")
-        day = int(day)
-        qidx = int(qidx)
-        question_idx = (day - 1) * 40 + qidx
-        q = all_questions[question_idx]
+        day, qidx = bank.locate(gid)
+        card = bank.card(gid)
     except Exception:
-        st.session_state.bulk_mistake_idx += 1
+        state.idx += 1
         st.rerun()
         return
 
     # Display question info
-    st.markdown(f"**Mistake {idx + 1} / {total}**")
-    st.markdown(f"**Day {day} Q{qidx+1}** — Times missed: {mistakes[key]}")
-    st.markdown(q.get("instruction", ""))
-    st.markdown(q.get("question", ""))
+    with phase("bulk_mistake_practice.widgets"):
+        st.markdown(f"**Mistake {idx + 1} / {total}**")
+        st.markdown(f"**Day {day} Q{qidx+1}** — Times missed: {miss_counts.get(gid, 0)}")
+        st.markdown(card.instruction)
+        st.markdown(card.question)
 
-    selected_keys = []
-    for opt, text in q.get("options", {}).items():
-        if st.checkbox(f"{opt}: {text}", key=f"bulk_mistake_opt_{opt}_{idx}"):
-            selected_keys.append(opt)
+        selected_keys = []
+        for opt, label in card.options:
+            if st.checkbox(label, key=state.widget_key("opt", opt)):
+                selected_keys.append(opt)
 
     if st.button("Submit", key=f"bulk_mistake_submit_{idx}"):
         if not selected_keys:
             st.warning("⚠️ Please select at least one answer before submitting.")
         else:
-            correct = set(q.get("answers", []))
-            selected = set(selected_keys)
-            if selected == correct:
+            with phase("bulk_mistake_practice.grade"):
+                result = grade(bank, gid, selected_keys)
+                scheduler.review(gid, result.correct)
+                record_attempt(bank, gid, selected_keys, result.correct, "bulk", started=card_timer(state, idx))
+            if result.correct:
                 st.success("✅ Correct!")
-                st.session_state.bulk_mistake_correct += 1
+                state.correct += 1
             else:
                 st.error("❌ Incorrect.")
-                correct_texts = sorted(correct) 
-                st.markdown("**Correct Answer(s):** " + ", ".join(correct_texts))
-                # Update mistake count
-                mistakes[key] = mistakes.get(key, 0) + 1
-                from utils.utils import save_json
-                save_json(mistakes_file, mistakes)
-            st.session_state.bulk_mistake_submitted = True
+                st.markdown("**Correct Answer(s):** " + card.answer)
+            state.submitted = True
 
     if st.button("Next", key=f"bulk_mistake_next_{idx}"):
-        if not st.session_state.bulk_mistake_submitted:
+        if not state.submitted:
             st.warning("⚠️ Please submit your answer before moving on.")
         else:
-            for opt in q.get("options", {}).keys():
-                st.session_state.pop(f"bulk_mistake_opt_{opt}_{idx}", None)
-            st.session_state.bulk_mistake_idx += 1
-            st.session_state.bulk_mistake_submitted = False
+            state.reset_widgets()
+            state.idx += 1
+            state.submitted = False
             st.rerun()
 
     st.progress((idx + 1) / total)
@@ -1,6 +1,11 @@
 import streamlit as st
-import random
-from utils.utils import load_json, save_json
+from utils.utils import load_json, set_json_value, increment_json_counter
+from utils.scheduler import session_scheduler
+from utils.grading import grade
+from utils.attempts import record_attempt, card_timer
+from utils.session import mode_state
+from utils.profiling import timed, phase
+from utils import rounds
 
 DATA_DIR = "bulk_practice/data/"
 PROGRESS_FILE = DATA_DIR + "bulk_progress.json"
@@ -8,122 +13,138 @@ ANSWERED_FILE = DATA_DIR + "bulk_answered_ids.json"
 ORDER_FILE = DATA_DIR + "bulk_flashcard_state.json"
 MISTAKES_FILE = DATA_DIR + "bulk_mistakes.json" # Modified this line
 
+@timed("render.bulk_practice")
 def run_bulk_practice_mode(all_questions, days):
     st.header("Bulk Practice Mode")
+    state = mode_state(st.session_state, "bulk")
 
     # Step 1: Select days and start
-    if "bulk_started" not in st.session_state or not st.session_state.bulk_started:
-        selected_days = st.multiselect("Select days to practice", list(range(1, 8)), default=days or [1])
+    if not state.get("started", False):
+        selected_days = st.multiselect("Select days to practice", all_questions.days, default=days or [1])
         if st.button("Start"):
             if not selected_days:
                 st.warning("Please select at least one day.")
                 return
             st.session_state.bulk_days = selected_days
-            st.session_state.bulk_started = True
             # Reset all session state for a new run
-            for k in list(st.session_state.keys()):
-                if k.startswith("bulk_"):
-                    del st.session_state[k]
-            st.session_state.bulk_days = selected_days
-            st.session_state.bulk_started = True
+            state.clear()
+            state.started = True
             st.rerun()
         return
 
-    # Step 2: Prepare questions for selected days
+    # Step 2: Look up the (cached) selection and resume the saved round
     days = st.session_state.get("bulk_days", [])
-    selected_questions = []
-    question_map = []
-    for day in days:
-        start = (day - 1) * 40
-        end = day * 40
-        day_questions = all_questions[start:end]
-        for idx, q in enumerate(day_questions):
-            selected_questions.append(q)
-            question_map.append((day, idx))
-    total = len(selected_questions)
+    selected_gids = all_questions.gids_for_days(days)
+    total = len(selected_gids)
+    scheduler = session_scheduler(st.session_state)
     session_key = "_".join(map(str, sorted(days)))
     today_key = f"bulk_{session_key}"
 
-    # Initialize or restore order/index
-    if "bulk_order" not in st.session_state or "bulk_index" not in st.session_state:
-        st.session_state.bulk_order = list(range(total))
-        random.shuffle(st.session_state.bulk_order)
-        st.session_state.bulk_index = 0
-        st.session_state.bulk_submitted = False
-        st.session_state.bulk_correct_count = 0
-        st.session_state.bulk_completed = False
+    def new_round(shuffle_only=False):
+        # Due cards first (see utils.scheduler), then a seeded shuffle (see utils.rounds)
+        due = []
+        if not shuffle_only:
+            position_of_gid = {gid: i for i, gid in enumerate(selected_gids)}
+            due = [position_of_gid[gid] for gid in scheduler.due_order(position_of_gid, limit=rounds.MAX_DUE)]
+        return rounds.new_round(total, all_questions.digest, due)
+
+    def save_round():
+        set_json_value(ORDER_FILE, today_key, dict(state.round, correct=state.correct_count))
+
+    def restart_round(rnd):
+        state.round = rnd
+        state.submitted = False
+        state.correct_count = 0
+        state.completed = False
+        state.reset_widgets()
+        set_json_value(ANSWERED_FILE, today_key, [])
+        save_round()
+
+    # Initialize or restore the round: (seed, cursor, bank version). The
+    # confirmed days can change in the sidebar while a round is open, so
+    # the round in the session must belong to this day set.
+    in_session = state.get("round")
+    if state.get("round_key") != today_key or not rounds.is_current(in_session, total, all_questions.digest):
+        state.round_key = today_key
+        with phase("bulk_practice.load"):
+            saved_state = load_json(ORDER_FILE, {}).get(today_key)
+        state.submitted = False
+        state.reset_widgets()
+        if rounds.is_current(saved_state, total, all_questions.digest):
+            state.round = {k: v for k, v in saved_state.items() if k != "correct"}
+            state.correct_count = saved_state.get("correct", 0)
+            state.completed = rounds.finished(state.round)
+        else:
+            restart_round(new_round())
 
     # Shuffle button
     if st.button("Shuffle"):
-        random.shuffle(st.session_state.bulk_order)
-        st.session_state.bulk_index = 0
-        st.session_state.bulk_submitted = False
-        st.session_state.bulk_correct_count = 0
-        st.session_state.bulk_completed = False
-        for k in list(st.session_state.keys()):
-            if k.startswith("bulk_opt_"):
-                del st.session_state[k]
+        restart_round(new_round(shuffle_only=True))
         st.rerun()
 
     # Start Again button
     if st.button("Start Again"):
-        for k in list(st.session_state.keys()):
-            if k.startswith("bulk_"):
-                del st.session_state[k]
-        st.session_state.bulk_started = False
+        state.clear()
         st.rerun()
 
     # End of round
-    if st.session_state.bulk_index >= len(st.session_state.bulk_order):
-        st.session_state.bulk_completed = True
-        accuracy = (st.session_state.bulk_correct_count / total) * 100 if total > 0 else 0
+    if rounds.finished(state.round):
+        if not state.completed:
+            increment_json_counter(PROGRESS_FILE, today_key)
+            state.completed = True
+        accuracy = (state.correct_count / total) * 100 if total > 0 else 0
         st.success("🎉 You've completed all questions for this round.")
-        st.info(f"Your accuracy: **{accuracy:.1f}%** ({st.session_state.bulk_correct_count} out of {total} correct)")
+        st.info(f"Your accuracy: **{accuracy:.1f}%** ({state.correct_count} out of {total} correct)")
+        st.caption(f"Completed rounds for this selection: {load_json(PROGRESS_FILE, {}).get(today_key, 0)}")
+        if st.button("Start New Round"):
+            restart_round(new_round())
+            st.rerun()
         return
 
-    idx = st.session_state.bulk_order[st.session_state.bulk_index]
-    q = selected_questions[idx]
-    day, orig_idx = question_map[idx]
+    idx = rounds.position(state.round)
+    gid = selected_gids[idx]
+    card = all_questions.card(gid)
+    day, orig_idx = all_questions.locate(gid)
+    shown_at = card_timer(state, state.round["index"])
 
-    st.markdown(f"**Day {day} — Question {st.session_state.bulk_index + 1} / {total}**")
-    st.markdown(q.get("instruction", ""))
-    st.markdown(q.get("question", ""))
+    with phase("bulk_practice.widgets"):
+        st.markdown(f"**Day {day} — Question {state.round['index'] + 1} / {total}**")
+        st.markdown(card.instruction)
+        st.markdown(card.question)
 
-    selected_keys = []
-    for key, text in q.get("options", {}).items():
-        if st.checkbox(f"{key}: {text}", key=f"bulk_opt_{key}_{idx}"):
-            selected_keys.append(key)
+        selected_keys = []
+        for key, label in card.options:
+            if st.checkbox(label, key=state.widget_key("opt", key)):
+                selected_keys.append(key)
 
     if st.button("Submit", key=f"bulk_submit_{idx}"):
         if not selected_keys:
             st.warning("⚠️ Please select at least one answer before submitting.")
         else:
-            correct = set(q.get("answers", []))  # Remove sorting here
-            selected = set(selected_keys)
-            
-            if selected == correct:
+            with phase("bulk_practice.grade"):
+                result = grade(all_questions, gid, selected_keys)
+
+                scheduler.review(gid, result.correct)
+                # Logs the answer, the mistake and the answered id in one append
+                record_attempt(all_questions, gid, selected_keys, result.correct, "bulk",
+                               started=shown_at, answered=(today_key, idx))
+            if result.correct:
                 st.success("✅ Correct!")
-                st.session_state.bulk_correct_count += 1
+                state.correct_count += 1
             else:
                 st.error("❌ Incorrect.")
-                sorted_answers = sorted(correct)  # Sort only for display
-                st.markdown(f"**Correct answers are:** {', '.join(sorted_answers)}")
-                # Log mistake
-                mistakes = load_json(MISTAKES_FILE, {})
-                question_key = f"day{day}_q{orig_idx}"
-                mistakes[question_key] = mistakes.get(question_key, 0) + 1
-                save_json(MISTAKES_FILE, mistakes)
-            st.session_state.bulk_submitted = True
+                st.markdown(f"**Correct answers are:** {card.answer}")
+            state.submitted = True
 
     if st.button("Next", key=f"bulk_next_{idx}"):
-        if not st.session_state.bulk_submitted:
+        if not state.submitted:
             st.warning("⚠️ Please submit your answer before going to the next question.")
         else:
-            for k in q.get("options", {}).keys():
-                st.session_state.pop(f"bulk_opt_{k}_{idx}", None)
-            st.session_state.bulk_index += 1
-            st.session_state.bulk_submitted = False
+            state.reset_widgets()
+            state.round = rounds.advance(state.round)
+            state.submitted = False
+            save_round()
             st.rerun()
 
-    st.progress((st.session_state.bulk_index + 1) / total)
-    st.caption(f"Progress: {st.session_state.bulk_index + 1} / {total}")
\ No newline at end of file
+    st.progress((state.round["index"] + 1) / total)
+    st.caption(f"Progress: {state.round['index'] + 1} / {total}")
\ No newline at end of file
@@ -1,6 +1,12 @@
 import streamlit as st
-import random
-from utils.utils import save_json, load_json
+from utils.utils import load_json, set_json_value
+from utils.question_bank import get_question_bank
+from utils.grading import grade
+from utils.attempts import record_attempt, card_timer
+from utils.session import mode_state
+from utils.scheduler import session_scheduler
+from utils.profiling import timed, phase
+from utils import rounds
 
 DATA_DIR = "day_practice/data/"
 PROGRESS_FILE = DATA_DIR + "day_progress.json"
@@ -8,126 +14,128 @@ ANSWERED_FILE = DATA_DIR + "day_answered_ids.json"
 MISTAKES_FILE = DATA_DIR + "day_mistakes.json"
 ORDER_FILE = DATA_DIR + "day_flashcard_state.json"
 
+def _new_round(scheduler, bank, day_gids):
+    """A round over the day: due cards first (most overdue first), then a seeded shuffle."""
+    start = day_gids.start
+    due = [gid - start for gid in scheduler.due_order(day_gids, limit=rounds.MAX_DUE)]
+    return rounds.new_round(len(day_gids), bank.digest, due)
+
+@timed("render.flashcards")
 def run_flashcard_mode(questions, day):
     total = len(questions)
     today_key = f"day{day}"
+    bank = get_question_bank()
+    day_gids = bank.day_gids(day)
+    scheduler = session_scheduler(st.session_state)
+    state = mode_state(st.session_state, "flashcards")
 
     # ─── Load progress, answered questions, and mistakes ─────────────────
-    answered_data = load_json(ANSWERED_FILE, {})
-    answered_ids = answered_data.get(today_key, [])
-
-    progress_data = load_json(PROGRESS_FILE, {})
-    completed_rounds = progress_data.get(today_key, 0)
-
-    flashcard_state = load_json(ORDER_FILE, {})
-    saved_state = flashcard_state.get(today_key, {})
-    if "flashcard_order" not in st.session_state or "flashcard_index" not in st.session_state:
-        if saved_state:
-            st.session_state.flashcard_order = saved_state["order"]
-            st.session_state.flashcard_index = saved_state["index"]
+    with phase("flashcards.load"):
+        answered_data = load_json(ANSWERED_FILE, {})
+        answered_ids = answered_data.get(today_key, [])
+
+        progress_data = load_json(PROGRESS_FILE, {})
+        completed_rounds = progress_data.get(today_key, 0)
+
+    # The day can change in the sidebar while a round is open: the round in
+    # the session has to belong to this day (and bank version)
+    if state.get("round_key") != today_key or not rounds.is_current(state.get("round"), total, bank.digest):
+        state.round_key = today_key
+        state.reset_widgets()
+        # Saved rounds are (seed, cursor, bank version), see utils.rounds
+        saved_round = load_json(ORDER_FILE, {}).get(today_key)
+        if rounds.is_current(saved_round, total, bank.digest):
+            state.round = saved_round
         else:
-            st.session_state.flashcard_order = list(range(total))
-            random.shuffle(st.session_state.flashcard_order)
-            st.session_state.flashcard_index = 0
+            state.round = _new_round(scheduler, bank, day_gids)
 
-        st.session_state.flashcard_submitted = False
-        st.session_state.selected_options = set()
-        st.session_state.round_completed = False
-        st.session_state.round_correct_count = 0  # <-- Only for current round
+        state.submitted = False
+        # A saved round that is already finished was counted when it finished
+        state.round_completed = rounds.finished(state.round)
+        state.correct_count = 0  # <-- Only for current round
 
     # ─── Current question setup ──────────────────────────────────────────
-    if st.session_state.flashcard_index >= len(st.session_state.flashcard_order):
+    if rounds.finished(state.round):
         # Update completed rounds and reset for next round
-        if not st.session_state.get("round_completed", False):
+        if not state.get("round_completed", False):
             progress_data[today_key] = completed_rounds + 1
-            save_json(PROGRESS_FILE, progress_data)
-            st.session_state.round_completed = True
+            set_json_value(PROGRESS_FILE, today_key, completed_rounds + 1)
+            state.round_completed = True
 
         # Show accuracy for this round only
         accuracy = 0
         if total > 0:
-            accuracy = (st.session_state.round_correct_count / total) * 100
+            accuracy = (state.correct_count / total) * 100
         st.success("🎉 You've completed all questions for this round.")
-        st.info(f"Your accuracy: **{accuracy:.1f}%** ({st.session_state.round_correct_count} out of {total} correct)")
+        st.info(f"Your accuracy: **{accuracy:.1f}%** ({state.correct_count} out of {total} correct)")
 
         # Reset correct count for next round
         if st.button("Start New Round"):
-            st.session_state.flashcard_order = list(range(total))
-            random.shuffle(st.session_state.flashcard_order)
-            st.session_state.flashcard_index = 0
-            st.session_state.flashcard_submitted = False
-            st.session_state.selected_options = set()
-            st.session_state.round_correct_count = 0  # <-- Reset for new round
-            st.session_state.round_completed = False
+            state.round = _new_round(scheduler, bank, day_gids)
+            state.submitted = False
+            state.correct_count = 0  # <-- Reset for new round
+            state.round_completed = False
 
             # Reset answered_ids for progress bar
-            answered_data[today_key] = []
-            save_json(ANSWERED_FILE, answered_data)
+            set_json_value(ANSWERED_FILE, today_key, [])
 
             st.rerun()
         return
 
-    idx = st.session_state.flashcard_order[st.session_state.flashcard_index]
-    q = questions[idx]
+    idx = rounds.position(state.round)
+    card = bank.card(day_gids[idx])
+    shown_at = card_timer(state, state.round["index"])
 
-    st.markdown(f"**Question {st.session_state.flashcard_index + 1} / {total}**")
-    st.markdown(q["instruction"])
-    st.markdown(q["question"])
+    # ─── Render Question and Checkboxes ──────────────────────────────────
+    with phase("flashcards.widgets"):
+        st.markdown(f"**Question {state.round['index'] + 1} / {total}**")
+        st.markdown(card.instruction)
+        st.markdown(card.question)
 
-    # ─── Render Checkboxes ───────────────────────────────────────────────
-    selected_keys = []
-    for key, text in q["options"].items():
-        if st.checkbox(f"{key}: {text}", key=f"opt_{key}"):
-            selected_keys.append(key)
+        selected_keys = []
+        for key, label in card.options:
+            if st.checkbox(label, key=state.widget_key("opt", key)):
+                selected_keys.append(key)
 
     # ─── Submit Logic ────────────────────────────────────────────────────
     if st.button("Submit"):
         if not selected_keys:
             st.warning("⚠️ Please select at least one answer before submitting.")
         else:
-            correct = set(q["answers"])
-            selected = set(selected_keys)
-
-            if selected == correct:
+            gid = day_gids[idx]
+            with phase("flashcards.grade"):
+                result = grade(bank, gid, selected_keys)
+
+                scheduler.review(gid, result.correct)
+                # One log append records the answer, the mistake and the progress
+                # (folded into the JSON files by utils.attempts.compact)
+                record_attempt(bank, gid, selected_keys, result.correct, "day",
+                               started=shown_at, answered=(today_key, idx))
+            if result.correct:
                 st.success("✅ Correct!")
-                st.session_state.round_correct_count += 1
+                state.correct_count += 1
             else:
                 st.error("❌ Incorrect.")
-                sorted_answers = sorted(correct)  # Sort only for display
-                st.markdown(f"**Correct answers are:** {', '.join(sorted_answers)}")
-
-                # Log mistake
-                mistakes = load_json(MISTAKES_FILE, {})
-                question_key = f"{today_key}_q{idx}"
-                mistakes[question_key] = mistakes.get(question_key, 0) + 1
-                save_json(MISTAKES_FILE, mistakes)
+                st.markdown(f"**Correct answers are:** {card.answer}")
 
-            # Save progress
             if idx not in answered_ids:
                 answered_ids.append(idx)
-                answered_data[today_key] = answered_ids
-                save_json(ANSWERED_FILE, answered_data)
 
-            st.session_state.flashcard_submitted = True
+            state.submitted = True
 
     # ─── Next Logic ──────────────────────────────────────────────────────
     if st.button("Next"):
-        if not st.session_state.flashcard_submitted:
+        if not state.submitted:
             st.warning("⚠️ Please submit your answer before going to the next question.")
         else:
             # Clear checkboxes
-            for k in q["options"].keys():
-                st.session_state.pop(f"opt_{k}", None)
+            state.reset_widgets()
 
-            st.session_state.flashcard_index += 1
-            st.session_state.flashcard_submitted = False
+            state.round = rounds.advance(state.round)
+            state.submitted = False
 
-            # Save progress to state file
-            flashcard_state[today_key] = {
-                "order": st.session_state.flashcard_order,
-                "index": st.session_state.flashcard_index
-            }
-            save_json(ORDER_FILE, flashcard_state)
+            # Save progress to state file (a few bytes, whatever the day size)
+            set_json_value(ORDER_FILE, today_key, state.round)
 
             st.rerun()
 
@@ -142,22 +150,12 @@ def run_flashcard_mode(questions, day):
 
     # ─── Reset Day Button ────────────────────────────────────────────────
     if st.button("🔄 Reset Today"):
-        answered_data[today_key] = []
-        save_json(ANSWERED_FILE, answered_data)
-
-        progress_data[today_key] = 0
-        save_json(PROGRESS_FILE, progress_data)
-
-        flashcard_state.pop(today_key, None)
-        save_json(ORDER_FILE, flashcard_state)
+        set_json_value(ANSWERED_FILE, today_key, [])
+        set_json_value(PROGRESS_FILE, today_key, 0)
+        set_json_value(ORDER_FILE, today_key, None)
 
         # Clear session state
-        for k in list(st.session_state.keys()):
-            if k.startswith("opt_") or k in [
-                "flashcard_index", "flashcard_order", "flashcard_submitted",
-                "correct_count", "round_completed"
-            ]:
-                del st.session_state[k]
+        state.clear()
 
         st.success("✅ Progress for today has been reset.")
         st.rerun()
\ No newline at end of file
@@ -1,127 +1,117 @@
 import streamlit as st
-import random
-from utils.utils import load_json, load_questions, get_day_questions
+from utils.utils import load_day_mistakes_by_gid
+from utils.question_bank import get_question_bank
+from utils.grading import grade
+from utils.attempts import record_attempt, card_timer
+from utils.session import mode_state
+from utils.scheduler import session_scheduler
+from utils.profiling import timed, phase
 
 DATA_DIR = "day_practice/data/"
 MISTAKES_FILE = DATA_DIR + "day_mistakes.json"
 
+@timed("render.mistake_practice")
 def run_mistake_practice_mode(day):
     st.title(f"🔁 Mistake Practice – Day {day}")
 
-    # ─── 1) Load all mistakes and filter for today ────────────────────────
-    mistake_data = load_json(MISTAKES_FILE, {})
-    day_prefix = f"day{day}_q"
-    filtered = {k: v for k, v in mistake_data.items() if k.startswith(day_prefix)}
-
-    if not filtered:
+    # ─── 1) Load today's mistakes, by global question id ─────────────────
+    # (near-duplicates count for their canonical question, see utils.dedup)
+    bank = get_question_bank()
+    with phase("mistake_practice.load"):
+        miss_counts = load_day_mistakes_by_gid(bank, MISTAKES_FILE, day)
+    if not miss_counts:
         st.success("🎉 No mistakes logged for this day! Nothing to practice.")
         return
 
-    # ─── 2) Build a list of unique question indices you got wrong ───────
-    q_indices = sorted({int(key.split("_q")[1]) for key in filtered.keys()})
-
-    # ─── 3) Load all questions, then select just “day” questions ────────
-    all_questions = load_questions("questions.json")
-    day_questions = get_day_questions(all_questions, day)
-    # Only include indices that are valid for day_questions
-    valid_q_indices = [i for i in q_indices if 0 <= i < len(day_questions)]
-    if len(valid_q_indices) < len(q_indices):
-        st.warning("Some mistake entries refer to questions that do not exist for this day. They will be skipped.")
-    practice_questions = [day_questions[i] for i in valid_q_indices]
-    total = len(practice_questions)
-
-    # ─── 4) Initialize session_state for mistake practice ─────────────
-    if ("mistake_order" not in st.session_state
-        or "mistake_index" not in st.session_state):
-        
-        order = list(range(total))
-        random.shuffle(order)
-
-        st.session_state.mistake_order = order
-        st.session_state.mistake_index = 0
-        st.session_state.mistake_correct = 0
-        st.session_state.mistake_submitted = False
-
-    # ─── 5) If we've practiced all mistaken cards, show results + Restart ─
-    if st.session_state.mistake_index >= total:
-        correct_count = st.session_state.mistake_correct
+    practice_gids = sorted(miss_counts)
+    total = len(practice_gids)
+
+    # Due (and most missed) cards first
+    scheduler = session_scheduler(st.session_state)
+    state = mode_state(st.session_state, "mistake_practice")
+    card_of_gid = {gid: i for i, gid in enumerate(practice_gids)}
+
+    def practice_order():
+        return [card_of_gid[gid] for gid in scheduler.order(practice_gids, priority=miss_counts)]
+
+    # ─── 2) Initialize session_state for mistake practice ─────────────
+    # (again whenever the set of mistaken questions changed, e.g. another day)
+    if "order" not in state or state.get("gids") != practice_gids:
+        state.gids = practice_gids
+        state.order = practice_order()
+        state.index = 0
+        state.correct = 0
+        state.submitted = False
+
+    # ─── 3) If we've practiced all mistaken cards, show results + Restart ─
+    if state.index >= total:
+        correct_count = state.correct
         accuracy_pct = (correct_count / total) * 100 if total > 0 else 0.0
 
         st.success(f"🎉 You've practiced all {total} mistaken question{'s' if total > 1 else ''}!")
         st.markdown(f"**Your practice accuracy:** {accuracy_pct:.1f}%")
 
         if st.button("🔁 Restart Mistake Practice"):
-            new_order = list(range(total))
-            random.shuffle(new_order)
-
-            st.session_state.mistake_order = new_order
-            st.session_state.mistake_index = 0
-            st.session_state.mistake_correct = 0
-            st.session_state.mistake_submitted = False
+            state.order = practice_order()
+            state.index = 0
+            state.correct = 0
+            state.submitted = False
 
-            # Clear checkbox keys from session_state
-            for q in practice_questions:
-                for opt_key in q["options"].keys():
-                    st.session_state.pop(f"mistake_opt_{opt_key}", None)
+            # Clear checkboxes
+            state.reset_widgets()
 
             st.rerun()
 
         return
 
-    # ─── 6) Otherwise, show the current mistaken question ───────────────
-    curr_pos = st.session_state.mistake_index
-    card_idx = st.session_state.mistake_order[curr_pos]
-    q = practice_questions[card_idx]
+    # ─── 4) Otherwise, show the current mistaken question ───────────────
+    curr_pos = state.index
+    card_idx = state.order[curr_pos]
+    card = bank.card(practice_gids[card_idx])
+    shown_at = card_timer(state, curr_pos)
 
-    st.markdown(f"**Mistake {curr_pos + 1} / {total}**")
-    st.markdown(q["instruction"])
-    st.markdown(q["question"])
+    # ─── 5) Render the question and checkboxes for options ─────────────
+    with phase("mistake_practice.widgets"):
+        st.markdown(f"**Mistake {curr_pos + 1} / {total}**")
+        st.markdown(card.instruction)
+        st.markdown(card.question)
 
-    # ─── 7) Render checkboxes for options ──────────────────────────────
-    selected_keys = []
-    for opt_letter, opt_text in q["options"].items():
-        if st.checkbox(f"{opt_letter}: {opt_text}", key=f"mistake_opt_{opt_letter}"):
-            selected_keys.append(opt_letter)
+        selected_keys = []
+        for opt_letter, label in card.options:
+            if st.checkbox(label, key=state.widget_key("opt", opt_letter)):
+                selected_keys.append(opt_letter)
 
-    # ─── 8) Submit logic for this card ─────────────────────────────────
+    # ─── 6) Submit logic for this card ─────────────────────────────────
     if st.button("Submit Mistake"):
         if not selected_keys:
             st.warning("⚠️ Please select at least one answer before submitting.")
         else:
-            correct_set = set(q["answers"])  # Remove sorting here
-            selected_set = set(selected_keys)
+            gid = practice_gids[card_idx]
+            with phase("mistake_practice.grade"):
+                result = grade(bank, gid, selected_keys)
 
-            if selected_set == correct_set:
+                scheduler.review(gid, result.correct)
+                record_attempt(bank, gid, selected_keys, result.correct, "day", started=shown_at)
+            if result.correct:
                 st.success("✅ Correct!")
-                st.session_state.mistake_correct += 1
+                state.correct += 1
             else:
                 st.error("❌ Incorrect.")
-                sorted_answers = sorted(correct_set)  # Sort only for display
-                st.markdown(f"**Correct answers are:** {', '.join(sorted_answers)}")
-
-                # Increment mistake count in mistakes.json
-                # Find the mistake key for this question
-                mistake_keys = [k for k in mistake_data.keys() if k.endswith(f"_q{q_indices[card_idx]}")]
-                if mistake_keys:
-                    key = mistake_keys[0]
-                    mistake_data[key] = mistake_data.get(key, 0) + 1
-                    from utils.utils import save_json
-                    save_json(MISTAKES_FILE, mistake_data)
+                st.markdown(f"**Correct answers are:** {card.answer}")
 
-            st.session_state.mistake_submitted = True
+            state.submitted = True
 
-    # ─── 9) Next‐Mistake logic ─────────────────────────────────────────
+    # ─── 7) Next‐Mistake logic ─────────────────────────────────────────
     if st.button("Next Mistake"):
-        if not st.session_state.mistake_submitted:
+        if not state.submitted:
             st.warning("⚠️ Please submit your answer before moving on.")
         else:
             # Clear checkboxes for this question
-            for opt_letter in q["options"].keys():
-                st.session_state.pop(f"mistake_opt_{opt_letter}", None)
+            state.reset_widgets()
 
-            st.session_state.mistake_index += 1
-            st.session_state.mistake_submitted = False
+            state.index += 1
+            state.submitted = False
             st.rerun()
 
-    # ─── 10) Progress indicator ───────────────────────────────────────
+    # ─── 8) Progress indicator ───────────────────────────────────────
     st.caption(f"Progress: {curr_pos} / {total}")
\ No newline at end of file
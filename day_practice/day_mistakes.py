@@ -1,40 +1,27 @@
 import streamlit as st
-from utils.utils import load_json
+from utils.utils import load_day_mistakes_by_gid
+from utils.question_bank import get_question_bank
+from utils.paging import render_pager
+from utils.profiling import timed
 
 DATA_DIR = "day_practice/data/"
 MISTAKES_FILE = DATA_DIR + "day_mistakes.json"
 
+@timed("render.mistake_review")
 def run_mistake_review_mode(day):
     st.title(f"❌ Mistake Review – Day {day}")
 
-    # Load all mistakes
-    mistake_data = load_json(MISTAKES_FILE, {})
+    # Load mistakes for current day (near-duplicates merged, see utils.dedup)
+    bank = get_question_bank()
+    by_gid = load_day_mistakes_by_gid(bank, MISTAKES_FILE, day)
 
-    # Filter for current day
-    day_prefix = f"day{day}_q"
-    filtered = {k: v for k, v in mistake_data.items() if k.startswith(day_prefix)}
-
-    if not filtered:
+    if not by_gid:
         st.success("🎉 No mistakes for this day! Great job!")
         return
 
-    # Load questions for today (needed to map back from qID)
-    from utils.utils import load_questions, get_day_questions
-    all_questions = load_questions("questions.json")
-    day_questions = get_day_questions(all_questions, day)
-
-    for key, count in filtered.items():
-        q_index = int(key.split("_q")[1])
-        q = day_questions[q_index]
-
-        st.markdown(f"**Q{q_index + 1}.** {q['question']}")
-        st.info(q["instruction"])
-
-        for k, v in q["options"].items():
-            st.markdown(f"- {k}: {v}")
-
-        correct_keys = [k for k in q["answers"]]
-        st.success("✅ Correct Answer(s): " + ", ".join(correct_keys))
-        st.warning(f"❌ You answered this wrong {count} time(s).")
-
-        st.markdown("---")
\ No newline at end of file
+    entries = list(by_gid.items())
+    start, end = render_pager(len(entries), f"mistake_review_day{day}")
+    for gid, count in entries[start:end]:
+        _, q_index = bank.locate(gid)
+        st.markdown(bank.card(gid).markdown(
+            f"Q{q_index + 1}.", f"\n\n:orange[❌ You answered this wrong {count} time(s).]"))
\ No newline at end of file
@@ -1,18 +1,16 @@
 import streamlit as st
+from utils.question_bank import get_question_bank
+from utils.paging import render_pager
+from utils.profiling import timed
 
+@timed("render.review")
 def run_review_mode(questions, day):
     st.title(f"📘 Review Mode – Day {day}")
 
-    for idx, q in enumerate(questions):
-        st.markdown(f"**Q{idx + 1}.** {q['question']}")
-        st.info(q["instruction"])
+    bank = get_question_bank()
+    day_gids = bank.day_gids(day)
 
-        # Show all options
-        for key, text in q["options"].items():
-            st.markdown(f"- {key}: {text}")
-
-        # Show correct answers
-        correct_keys = ", ".join(q["answers"])
-        st.success("✅ Correct Answer(s): " + correct_keys)
-
-        st.markdown("---")
\ No newline at end of file
+    # One pre-rendered markdown block per question (see utils.cards)
+    start, end = render_pager(len(questions), f"review_day{day}")
+    for idx in range(start, end):
+        st.markdown(bank.card(day_gids[idx]).markdown(f"Q{idx + 1}."))
@@ -1,81 +1,104 @@
 import streamlit as st
-from utils.utils import save_json, load_json
+from utils.question_bank import get_question_bank
+from utils.grading import grade_many, summarize
+from utils.attempts import record_attempts, card_timer
+from utils.quiz_builder import build_quiz
+from utils.session import mode_state
+from utils.profiling import timed, phase
 
-MISTAKES_FILE = "mistakes.json"
+DATA_DIR = "day_practice/data/"
+MISTAKES_FILE = DATA_DIR + "day_mistakes.json"
+DEFAULT_ADAPTIVE_SIZE = 20
 
+@timed("render.quiz")
 def run_quiz_mode(questions, day):
     st.title("🧠 Quiz Mode")
+    bank = get_question_bank()
+    _run_quiz(bank, bank.day_gids(day), f"day{day}")
 
-    total = len(questions)
-    responses = {}
-    submitted = st.session_state.get("quiz_submitted", False)
+@timed("render.adaptive_quiz")
+def run_adaptive_quiz_mode(bank, days):
+    st.title("🎯 Adaptive Quiz")
+    st.caption("Questions are drawn from every selected day, favouring the ones you miss most.")
+    builder = mode_state(st.session_state, "adaptive_quiz")
+    available = len(bank.gids_for_days(days))
+    if not available:
+        st.info("Please select days and confirm to use this mode.")
+        return
 
-    # ─── Render Each Question ─────────────────────────────────────────────
-    for idx, q in enumerate(questions):
-        st.markdown(f"**Q{idx + 1}.** {q['question']}")
-        st.info(q["instruction"])
-
-        options_list = list(q["options"].values())
-        selected = st.multiselect(f"Select answer(s) for Q{idx + 1}:", options_list, key=f"quiz_q_{idx}")
+    size = st.number_input("Number of questions", min_value=1, max_value=available,
+                           value=min(DEFAULT_ADAPTIVE_SIZE, available))
+    if st.button("New Quiz") or builder.get("days") != sorted(days):
+        builder.days = sorted(days)
+        builder.gids = build_quiz(bank, days, int(size))
+        builder.number = builder.get("number", 0) + 1
+    _run_quiz(bank, builder.gids, f"adaptive{builder.number}")
 
-        rev_map = {v: k for k, v in q["options"].items()}
-        selected_keys = [rev_map.get(s) for s in selected if s in rev_map]
-        responses[idx] = selected_keys
+def _run_quiz(bank, gids, quiz_key):
+    """Renders, grades and logs a quiz over `gids`; `quiz_key` identifies this quiz."""
+    total = len(gids)
+    state = mode_state(st.session_state, "quiz")
+    if state.get("quiz_key") != quiz_key:
+        state.clear()
+        state.quiz_key = quiz_key
+    submitted = state.get("submitted", False)
+    started = card_timer(state, quiz_key)
 
-        st.markdown("---")
-
-    # ─── Submit Button ────────────────────────────────────────────────────
-    if not submitted and st.button("Submit Quiz"):
-        score = 0
-        wrong_questions = {}
+    # ─── Render Each Question ─────────────────────────────────────────────
+    # Inside a form, changing an answer does not rerun the script; widgets
+    # hold option keys (labels come from format_func), so no reverse maps.
+    with phase("quiz.widgets"), st.form(f"quiz_{quiz_key}"):
+        for idx, gid in enumerate(gids):
+            card = bank.card(gid)
+            options = bank[gid]["options"]
+            st.markdown(f"**Q{idx + 1}.** {card.question}")
+            st.info(card.instruction)
+            st.multiselect(f"Select answer(s) for Q{idx + 1}:", list(options),
+                           format_func=options.get, key=state.widget_key("q", idx),
+                           disabled=submitted)
+            st.markdown("---")
+        submit_clicked = st.form_submit_button("Submit Quiz", disabled=submitted)
 
-        for idx, q in enumerate(questions):
-            correct = set(q["answers"])
-            selected = set(responses.get(idx, []))
-            if selected == correct:
-                score += 1
-            else:
-                # Record mistake
-                q_id = f"day{day}_q{idx}"
-                wrong_questions[q_id] = wrong_questions.get(q_id, 0) + 1
+    # ─── Grade in one pass and log mistakes in one batch ─────────────────
+    if submit_clicked and not submitted:
+        responses = {gids[idx]: st.session_state.get(state.widget_key("q", idx), []) for idx in range(total)}
+        with phase("quiz.grade"):
+            grades = grade_many(bank, responses)
+            totals = summarize(grades.values())
+            score = totals.correct
+            wrong_questions = {idx: 1 for idx in range(total) if not grades[gids[idx]].correct}
 
-        # Show score
-        st.session_state.quiz_submitted = True
-        st.session_state.quiz_wrong = wrong_questions  # Save for feedback
-        st.session_state.quiz_score = score
-        st.session_state.quiz_total = total
-        # Do NOT rerun here
+            state.submitted = True
+            state.wrong = wrong_questions  # Save for feedback
+            state.score = score
+            state.total = total
+            state.partial = totals
 
-        # Save mistakes
-        all_mistakes = load_json(MISTAKES_FILE, {})
-        for key, count in wrong_questions.items():
-            all_mistakes[key] = all_mistakes.get(key, 0) + count
-        save_json(MISTAKES_FILE, all_mistakes)
+            # One append logs every answer; wrong ones are folded into MISTAKES_FILE
+            record_attempts(bank, [(gid, selected, grades[gid].correct) for gid, selected in responses.items()],
+                            "quiz", started=started)
 
-        st.experimental_rerun()  # Optionally, rerun to show feedback
+        st.rerun()
 
     # ─── Show Results and Feedback ────────────────────────────────────────
     if submitted:
-        score = st.session_state.get("quiz_score", 0)
-        total = st.session_state.get("quiz_total", len(questions))
+        score = state.get("score", 0)
+        total = state.get("total", total)
         st.success(f"✅ Your Score: {score} / {total}")
+        partial = state.get("partial")
+        if partial:
+            st.caption(f"Options: {partial.hits} correct picks, {partial.false_picks} wrong picks, "
+                       f"{partial.misses} missed")
 
-        wrong_questions = st.session_state.get("quiz_wrong", {})
+        wrong_questions = state.get("wrong", {})
         if wrong_questions:
             st.markdown("### ❌ Questions you got wrong:")
-            for idx, q in enumerate(questions):
-                q_id = f"day{day}_q{idx}"
-                if q_id in wrong_questions:
-                    st.markdown(f"**Q{idx + 1}.** {q['question']}")
-                    correct_answers = [q["options"][k] for k in q["answers"]]
-                    st.info(f"Correct answer(s): {', '.join(correct_answers)}")
-                    st.markdown("---")
+            for idx in sorted(wrong_questions):
+                card = bank.card(gids[idx])
+                st.markdown(f"**Q{idx + 1}.** {card.question}")
+                st.info(f"Correct answer(s): {card.answer_text}")
+                st.markdown("---")
 
         if st.button("Reset Quiz"):
-            for idx in range(total):
-                st.session_state.pop(f"quiz_q_{idx}", None)
-            st.session_state.quiz_submitted = False
-            st.session_state.quiz_wrong = {}
-            st.session_state.quiz_score = 0
-            st.session_state.quiz_total = 0
-            st.experimental_rerun()
\ No newline at end of file
+            state.clear()
+            st.rerun()
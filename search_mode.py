@@ -0,0 +1,35 @@
+import time
+import streamlit as st
+from utils.paging import render_pager
+from utils.session import mode_state
+from utils.profiling import timed
+
+@timed("render.search")
+def run_search_mode(bank):
+    st.title("🔍 Search Questions")
+
+    query = st.text_input("Search question, instruction and option text",
+                          placeholder="e.g. subnet mask, or a word prefix like 'encryp'")
+    if not query.strip():
+        st.caption("Every word has to match; words also match longer words they start.")
+        return
+
+    # Re-search only when the query changes (paging reruns reuse the hits)
+    state = mode_state(st.session_state, "search")
+    if state.get("query") != query or state.get("digest") != bank.digest:
+        started = time.perf_counter()
+        state.hits = bank.search_index().search(query)
+        state.elapsed_ms = (time.perf_counter() - started) * 1000
+        state.query = query
+        state.digest = bank.digest
+    hits = state.hits
+
+    st.caption(f"{len(hits)} matching question(s) in {state.elapsed_ms:.1f} ms")
+    if not hits:
+        st.info("No questions match this search.")
+        return
+
+    start, end = render_pager(len(hits), "search")
+    for gid in hits[start:end]:
+        day, qidx = bank.locate(gid)
+        st.markdown(bank.card(gid).markdown(f"Day {day} Q{qidx + 1}."))
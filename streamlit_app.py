@@ -1,8 +1,14 @@
 import streamlit as st
 import os
-from utils.utils import load_questions, get_day_questions, save_json, clear_day_mistakes, clear_bulk_mistakes
+from utils.utils import (get_day_questions, save_json, clear_day_mistakes, clear_bulk_mistakes, store_stats,
+                         convert_legacy_keys)
+from utils.question_bank import get_question_bank, bank_cache_stats
+from utils.users import DEFAULT_BANK, set_current_user, set_current_bank, new_session_token
+from utils.session import session_footprint, clear_modes
+from utils.bank_registry import available_banks
+from utils import profiling
 from day_practice.day_flashcards import run_flashcard_mode
-from quiz_mode import run_quiz_mode
+from quiz_mode import run_quiz_mode, run_adaptive_quiz_mode
 from day_practice.day_review_mode import run_review_mode
 from day_practice.day_mistakes import run_mistake_review_mode
 from day_practice.day_mistake_practice import run_mistake_practice_mode
@@ -12,6 +18,8 @@ from bulk_practice.bulk_mistake_tools import (
     practice_bulk_mistakes
 )
 from bulk_practice.bulk_review_mode import run_bulk_review_mode
+from analytics_mode import run_analytics_mode
+from search_mode import run_search_mode
 
 DAY_MISTAKES_FILE = "day_practice/data/day_mistakes.json"
 BULK_MISTAKES_FILE = "bulk_practice/data/bulk_mistakes.json"
@@ -19,17 +27,54 @@ BULK_MISTAKES_FILE = "bulk_practice/data/bulk_mistakes.json"
 st.set_page_config(page_title="MM Prep Flashcards", layout="wide")
 st.title("📚 MM Prep - Study Tool")
 
-all_questions = load_questions("questions.json")
+# ─── Per-user state ─────────────────────────────────────────────────────
+# ?user=<id> selects whose progress and mistakes are used; new visitors get
+# a session token that is kept in the URL so a refresh resumes their state.
+if "user_id" not in st.session_state:
+    st.session_state.user_id = st.query_params.get("user") or new_session_token()
+    st.query_params["user"] = st.session_state.user_id
+set_current_user(st.session_state.user_id)
+profiling.start_rerun()
+
+# ─── Question bank ──────────────────────────────────────────────────────
+# ?bank=<id> picks one of the banks in STUDY_BANKS_DIR (see
+# utils.bank_registry); progress and mistakes are kept per bank.
+banks = available_banks()
+if st.session_state.get("bank_id") not in banks:
+    requested = st.query_params.get("bank")
+    st.session_state.bank_id = requested if requested in banks else DEFAULT_BANK
+if len(banks) > 1:
+    bank_ids = list(banks)
+    chosen_bank = st.sidebar.selectbox("Question bank", bank_ids, index=bank_ids.index(st.session_state.bank_id))
+    if chosen_bank != st.session_state.bank_id:
+        # Rounds and selections refer to the old bank's questions
+        clear_modes(st.session_state)
+        st.session_state.bulk_days = []
+        st.session_state.confirmed = False
+        st.session_state.bank_id = chosen_bank
+    st.query_params["bank"] = st.session_state.bank_id
+set_current_bank(st.session_state.bank_id)
+
+all_questions = get_question_bank()
+
+# Mistakes saved by day position before they were keyed by gid are
+# converted the first time this learner's state for the bank is loaded
+if st.session_state.get("keys_converted") != st.session_state.bank_id:
+    convert_legacy_keys()
+    st.session_state.keys_converted = st.session_state.bank_id
 
 # ─── Main Mode Selection ────────────────────────────────────────────────
 main_mode = st.sidebar.radio("Main Mode", [
     "Day Practice Mode",
-    "Bulk Practice Mode"
+    "Bulk Practice Mode",
+    "🔍 Search",
+    "📊 Analytics"
 ])
 
 if main_mode == "Day Practice Mode":
     st.sidebar.markdown("### Day Practice Options")
-    day = st.sidebar.selectbox("Choose study day (1–7)", list(range(1, 8)))
+    day = st.sidebar.selectbox(f"Choose study day (1–{all_questions.num_days})", all_questions.days,
+                               format_func=lambda d: f"Day {d} ({all_questions.partition.day_size(d)} questions)")
     day_questions = get_day_questions(all_questions, day)
     day_mode = st.sidebar.radio("Day Mode", [
         "Flashcard Mode",
@@ -51,7 +96,7 @@ if main_mode == "Day Practice Mode":
         st.header("🧹 Clear Mistake Log")
         if st.button(f"Delete Mistakes for Day {day}"):
             from utils.utils import clear_day_mistakes
-            if clear_day_mistakes(DAY_MISTAKES_FILE, day):
+            if clear_day_mistakes(DAY_MISTAKES_FILE, day, all_questions):
                 st.success(f"✅ Mistakes for Day {day} have been cleared.")
         else:
             st.info(f"No mistakes found for Day {day}.")
@@ -65,7 +110,7 @@ elif main_mode == "Bulk Practice Mode":
         st.session_state.confirmed = False
 
     if not st.session_state.confirmed:
-        selected_days = st.sidebar.multiselect("Select days to practice", list(range(1, 8)), default=st.session_state.bulk_days)
+        selected_days = st.sidebar.multiselect("Select days to practice", all_questions.days, default=st.session_state.bulk_days)
         if st.sidebar.button("Confirm Selection"):
             st.session_state.bulk_days = selected_days
             st.session_state.confirmed = True
@@ -82,6 +127,7 @@ elif main_mode == "Bulk Practice Mode":
         "Bulk Review Mode",
         "Bulk Mistake Review",
         "Bulk Practice Mistakes",
+        "🎯 Adaptive Quiz",
         "🧹 Clear Bulk Mistakes"
     ])
 
@@ -103,10 +149,33 @@ elif main_mode == "Bulk Practice Mode":
         show_all_bulk_mistakes()
     elif bulk_mode == "Bulk Practice Mistakes":
         practice_bulk_mistakes()
+    elif bulk_mode == "🎯 Adaptive Quiz":
+        if st.session_state.confirmed:
+            run_adaptive_quiz_mode(all_questions, days)
+        else:
+            st.info("Please select days and confirm to use this mode.")
     elif bulk_mode == "🧹 Clear Bulk Mistakes":
         st.header("🧹 Clear Bulk Mistake Log")
         if st.button("Delete All Bulk Practice Mistake History"):
             if clear_bulk_mistakes(BULK_MISTAKES_FILE):
                 st.success("✅ All bulk mistakes have been cleared.")
             else:
-                st.info("No bulk mistakes to clear yet.")
\ No newline at end of file
+                st.info("No bulk mistakes to clear yet.")
+
+elif main_mode == "🔍 Search":
+    run_search_mode(all_questions)
+
+elif main_mode == "📊 Analytics":
+    run_analytics_mode(all_questions)
+
+# ─── Session footprint ──────────────────────────────────────────────────
+num_keys, num_bytes = session_footprint(st.session_state)
+st.sidebar.caption(f"Session state: {num_keys} keys, ~{num_bytes / 1024:.1f} KB")
+
+# ─── Diagnostics (STUDY_PROFILE=1 only) ─────────────────────────────────
+if profiling.ENABLED:
+    rerun_profile = profiling.finish_rerun()
+    with st.sidebar.expander("🔧 Diagnostics", expanded=False):
+        st.code(profiling.format_rerun(rerun_profile), language=None)
+        st.caption(f"Writer: {store_stats()}")
+        st.caption(f"Banks: {bank_cache_stats()}")
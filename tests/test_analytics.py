@@ -0,0 +1,36 @@
+import numpy as np
+
+from utils.analytics import TREND_BUCKET, MistakeAnalytics, _drop_bank, _tables
+from utils.question_bank import DayPartition, QuestionBank, bank_key
+
+
+def _bank():
+    questions = [{"question": str(i), "options": {"A": "a", "B": "b"}, "answers": ["A"]} for i in range(6)]
+    return QuestionBank(questions, partition=DayPartition([4, 2]))
+
+
+def _ingest(engine, gids, correct, ts):
+    n = len(gids)
+    engine._ingest(np.array(gids, np.int64), np.ones(n, np.uint32), np.array(correct, bool),
+                   np.array(ts, np.float64))
+
+
+def test_trend_accumulates_across_batches():
+    engine = MistakeAnalytics(_bank())
+    day = TREND_BUCKET
+    _ingest(engine, [0, 1], [True, False], [day + 5, 2 * day + 1])
+    _ingest(engine, [4, 5], [False, False], [day + 9, 3 * day])
+    assert engine.trend() == [
+        {"start": day, "attempts": 2, "error_rate": 0.5},
+        {"start": 2 * day, "attempts": 1, "error_rate": 1.0},
+        {"start": 3 * day, "attempts": 1, "error_rate": 1.0},
+    ]
+    assert [row["attempts"] for row in engine.per_day()] == [2, 2]
+
+
+def test_engines_share_bank_tables_until_eviction():
+    bank = _bank()
+    first, second = MistakeAnalytics(bank, "a.jsonl"), MistakeAnalytics(bank, "b.jsonl")
+    assert first._tables is second._tables
+    _drop_bank(bank_key(bank))
+    assert bank_key(bank) not in _tables
@@ -0,0 +1,41 @@
+import json
+
+import pytest
+
+from utils.bank_loader import scan_json_array
+
+
+def _elements(text):
+    buf = text.encode("utf-8")
+    starts, ends = scan_json_array(buf)
+    return [json.loads(buf[s:e]) for s, e in zip(starts, ends)]
+
+
+def test_offsets_of_plain_elements():
+    questions = [{"question": "a", "answers": ["A"]}, {"question": "b", "answers": ["B", "C"]}]
+    assert _elements(json.dumps(questions)) == questions
+    assert _elements(json.dumps(questions, indent=2)) == questions
+
+
+def test_brackets_commas_and_quotes_in_strings():
+    questions = [
+        {"question": "Which of [a, b], {c}?", "options": {"A": "x, y]", "B": "}{"}},
+        {"question": 'He said "no, [never]" \\ then', "answers": ["A"]},
+        {"question": "trailing backslash \\", "options": {}},
+    ]
+    assert _elements(json.dumps(questions)) == questions
+
+
+def test_non_ascii_offsets_are_bytes():
+    questions = [{"question": "Größe ≥ 5, ok?"}, {"question": "日本語"}]
+    assert _elements(json.dumps(questions, ensure_ascii=False)) == questions
+
+
+def test_empty_array():
+    assert _elements("[]") == []
+    assert _elements("  [ \n ]  ") == []
+
+
+def test_incomplete_array_is_rejected():
+    with pytest.raises(ValueError):
+        scan_json_array(b'[{"question": "a"}, {"question": "b"')
@@ -0,0 +1,20 @@
+import json
+import os
+import subprocess
+import sys
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_learners_benchmark_runs_clean(tmp_path):
+    report_path = tmp_path / "report.json"
+    result = subprocess.run(
+        [sys.executable, "-m", "benchmarks.learners", "--users", "3", "--rounds", "1", "--answers", "4",
+         "--json", str(report_path)],
+        cwd=REPO_DIR, capture_output=True, text=True, timeout=300,
+    )
+    assert result.returncode == 0, result.stdout + result.stderr
+    report = json.loads(report_path.read_text())
+    assert report["errors"] == []
+    assert report["lost_mistake_updates"] == 0
+    assert report["answers"] > 0
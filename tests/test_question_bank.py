@@ -0,0 +1,78 @@
+import pytest
+
+from utils.question_bank import DAY_SIZES_ENV, DAY_WEIGHTS_ENV, DayPartition, QuestionBank, legacy_key_gid
+
+
+@pytest.mark.parametrize("total,weights", [(100, [1, 1, 2, 2]), (7, [1, 1, 1]), (1000, [3, 1, 1]), (5, [1] * 8)])
+def test_weighted_sums_to_total(total, weights):
+    partition = DayPartition.weighted(total, weights)
+    assert sum(partition.sizes) == total
+    assert partition.num_days == len(weights)
+    weight_sum = sum(weights)
+    # Largest remainder: every day is within one question of its exact share
+    assert all(abs(size - total * w / weight_sum) < 1 for size, w in zip(partition.sizes, weights))
+
+
+def test_weighted_hands_leftovers_to_largest_remainders():
+    assert DayPartition.weighted(10, [1, 1, 1]).sizes == (4, 3, 3)
+    assert DayPartition.weighted(7, [1, 2]).sizes == (2, 5)
+
+
+def test_from_sizes_repeats_the_last_size():
+    assert DayPartition.from_sizes(100, [40]).sizes == (40, 40, 20)
+    assert DayPartition.from_sizes(100, [10, 30]).sizes == (10, 30, 30, 30)
+    assert DayPartition.from_sizes(0, [40]).sizes == ()
+
+
+def test_locate_and_gid_round_trip():
+    partition = DayPartition([3, 5, 2])
+    for gid in range(10):
+        day, qidx = partition.locate(gid)
+        assert partition.gid(day, qidx) == gid
+    assert partition.locate(3) == (2, 0)
+    assert partition.gid(3, 2) is None
+    assert partition.gid(4, 0) is None
+    with pytest.raises(IndexError):
+        partition.locate(10)
+
+
+
+def test_legacy_keys_use_the_default_layout():
+    assert legacy_key_gid("day1_q0") == 0
+    assert legacy_key_gid("day2_q1") == 41
+    assert legacy_key_gid("day2_q40") is None
+    assert legacy_key_gid("day02_q1") is None
+    assert legacy_key_gid("41") is None
+
+
+def test_mistakes_by_gid_follows_aliases_across_layouts():
+    questions = [{"question": str(i), "options": {"A": "a"}, "answers": ["A"]} for i in range(90)]
+    bank = QuestionBank(questions, partition=DayPartition.from_sizes(90, [30]))
+    bank.set_aliases({41: 2, 95: 1})
+    assert bank.mistakes_by_gid({"41": 2, "2": 1, "89": 1, "90": 5, "day1_q0": 1}) == {2: 3, 89: 1}
+    assert bank.alias_days(1) == [1, 2]
+    assert bank.label(41) == "day2_q11"
+
+
+def test_own_mistakes_only():
+    questions = [{"question": str(i), "options": {"A": "a"}, "answers": ["A"]} for i in range(90)]
+    bank = QuestionBank(questions, partition=DayPartition.from_sizes(90, [30]))
+    bank.set_aliases({41: 2, 5: 1})
+    assert [bank.own_mistakes_only(day) for day in bank.days] == [False, False, True]
+
+
+@pytest.mark.parametrize("weights,sizes", [("0,0", None), ("1,-1", None), ("1,x", None), ("nan,1", None),
+                                           (None, "40,x"), (None, "-5"), (None, "0,40")])
+def test_from_env_ignores_invalid_layouts(monkeypatch, weights, sizes):
+    for name, value in ((DAY_WEIGHTS_ENV, weights), (DAY_SIZES_ENV, sizes)):
+        if value is None:
+            monkeypatch.delenv(name, raising=False)
+        else:
+            monkeypatch.setenv(name, value)
+    assert DayPartition.from_env(100).sizes == (40, 40, 20)
+
+
+def test_from_env_invalid_weights_fall_back_to_sizes(monkeypatch):
+    monkeypatch.setenv(DAY_WEIGHTS_ENV, "1,0")
+    monkeypatch.setenv(DAY_SIZES_ENV, "50")
+    assert DayPartition.from_env(100).sizes == (50, 50)
@@ -0,0 +1,53 @@
+import random
+
+import pytest
+
+from utils.quiz_builder import AliasTable, stratify
+
+
+def _table_probabilities(table):
+    """Exact draw probabilities encoded in the table."""
+    probs = [0.0] * table.n
+    for i in range(table.n):
+        probs[i] += table.prob[i] / table.n
+        probs[table.alias[i]] += (1.0 - table.prob[i]) / table.n
+    return probs
+
+
+@pytest.mark.parametrize("weights", [[1, 1, 1, 1], [1, 2, 3, 4], [0.5, 0.01, 0.99, 0.25, 0.5], [5]])
+def test_alias_table_probabilities(weights):
+    table = AliasTable(weights)
+    total = float(sum(weights))
+    assert _table_probabilities(table) == pytest.approx([w / total for w in weights])
+
+
+def test_alias_table_zero_weights_draw_uniformly():
+    assert _table_probabilities(AliasTable([0, 0, 0])) == pytest.approx([1 / 3] * 3)
+
+
+def test_alias_table_draw_distribution():
+    weights = [1, 3, 6]
+    table = AliasTable(weights)
+    rng = random.Random(0)
+    draws = 60000
+    counts = [0] * len(weights)
+    for _ in range(draws):
+        counts[table.draw(rng)] += 1
+    for count, weight in zip(counts, weights):
+        assert count / draws == pytest.approx(weight / 10, abs=0.01)
+
+
+@pytest.mark.parametrize("sizes,k", [([40, 40, 40], 10), ([1, 2, 3, 4], 7), ([100, 1], 5), ([3, 3, 3], 9)])
+def test_stratify_quotas_sum_to_k(sizes, k):
+    quotas = stratify(sizes, k)
+    assert sum(quotas) == k
+    assert all(0 <= q <= size for q, size in zip(quotas, sizes))
+    # Largest remainder: no stratum is more than one draw off its exact share
+    total = sum(sizes)
+    assert all(abs(q - k * size / total) < 1 for q, size in zip(quotas, sizes))
+
+
+def test_stratify_caps_k_at_the_population():
+    assert stratify([2, 3], 10) == [2, 3]
+    assert stratify([0, 0], 4) == [0, 0]
+    assert stratify([], 4) == []
@@ -0,0 +1,59 @@
+import pytest
+
+from utils import rounds
+
+
+@pytest.mark.parametrize("n", [1, 2, 3, 7, 40, 100, 1000, 1025])
+def test_permute_is_a_bijection(n):
+    for seed in (0, 1, 123456789):
+        assert sorted(rounds.permute(i, n, seed) for i in range(n)) == list(range(n))
+
+
+def test_permute_depends_on_the_seed():
+    n = 200
+    assert [rounds.permute(i, n, 1) for i in range(n)] != [rounds.permute(i, n, 2) for i in range(n)]
+
+
+def _visit(rnd):
+    seen = []
+    while not rounds.finished(rnd):
+        seen.append(rounds.position(rnd))
+        rnd = rounds.advance(rnd)
+    assert rounds.position(rnd) is None
+    return seen
+
+
+@pytest.mark.parametrize("n", [1, 5, 40, 333])
+def test_round_visits_every_position_once(n):
+    rnd = rounds.new_round(n, "digest", seed=7)
+    assert sorted(_visit(rnd)) == list(range(n))
+
+
+def test_due_positions_come_first():
+    due = [9, 3, 27]
+    rnd = rounds.new_round(40, "digest", due, seed=11)
+    seen = _visit(rnd)
+    assert seen[:3] == due
+    assert sorted(seen) == list(range(40))
+
+
+def test_due_prefix_is_capped():
+    rnd = rounds.new_round(500, "digest", range(200), seed=3)
+    assert len(rnd["due"]) == rounds.MAX_DUE
+    assert sorted(_visit(rnd)) == list(range(500))
+
+
+def test_advance_does_not_change_the_round():
+    rnd = rounds.new_round(10, "digest", seed=5)
+    before = dict(rnd)
+    rounds.advance(rnd)
+    assert rnd == before
+
+
+def test_is_current():
+    rnd = rounds.new_round(10, "abcdef0123456789")
+    assert rounds.is_current(rnd, 10, "abcdef0123456789")
+    assert not rounds.is_current(rnd, 11, "abcdef0123456789")
+    assert not rounds.is_current(rnd, 10, "another digest")
+    assert not rounds.is_current(None, 10, "abcdef0123456789")
+    assert not rounds.is_current([3, 1, 2], 3, "abcdef0123456789")
@@ -0,0 +1,18 @@
+from utils.scheduler import CardState, Scheduler
+from utils.session import session_footprint
+
+
+def test_footprint_counts_the_scheduler_and_its_card_states():
+    small = Scheduler({0: CardState(due=1.0)})
+    large = Scheduler({gid: CardState(due=float(gid)) for gid in range(1000)})
+    _, small_bytes = session_footprint({"srs_scheduler:bank": small})
+    _, large_bytes = session_footprint({"srs_scheduler:bank": large})
+    # Each card adds at least its slotted CardState and its heap entry
+    assert large_bytes - small_bytes > 999 * 100
+
+
+def test_footprint_counts_shared_objects_once():
+    states = {gid: CardState() for gid in range(100)}
+    _, once = session_footprint({"a": states})
+    _, twice = session_footprint({"a": states, "b": states})
+    assert twice - once < 200
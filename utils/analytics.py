@@ -0,0 +1,227 @@
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+from utils.attempts import ATTEMPTS_FILE, read_attempts
+from utils.question_bank import bank_key, on_bank_evicted
+from utils.users import shard_path
+
+MAX_OPTIONS = 32
+MAX_ENGINES = 64
+TREND_BUCKET = 24 * 60 * 60
+
+_engines = OrderedDict()
+_engines_lock = threading.Lock()
+_tables = {}  # bank_key -> _BankTables
+_tables_lock = threading.Lock()
+
+
+def _bits(masks):
+    """(k,) uint32 masks -> (k, MAX_OPTIONS) bool matrix."""
+    return ((masks[:, None] >> np.arange(MAX_OPTIONS, dtype=np.uint32)) & 1).astype(bool)
+
+
+class _BankTables:
+    """Per-question arrays of one bank, shared by every user's engine."""
+
+    def __init__(self, bank):
+        self.bank = bank
+        sizes = bank.partition.sizes
+        self.day_of_gid = np.repeat(np.arange(1, len(sizes) + 1, dtype=np.int64), sizes)
+        self._options = None
+        self._lock = threading.Lock()
+
+    def options(self):
+        """(answer bits, valid options): (n, MAX_OPTIONS) bool matrices, built on first use.
+
+        They need every question of the bank, so only the per-option views ask for them.
+        """
+        with self._lock:
+            if self._options is None:
+                bank, n = self.bank, len(self.bank)
+                answer_bits = _bits(np.array([bank.answer_mask(g) for g in range(n)], np.uint32))
+                num_options = np.array([len(bank.option_letters(g)) for g in range(n)], np.int64)
+                self._options = answer_bits, np.arange(MAX_OPTIONS) < num_options[:, None]
+            return self._options
+
+
+def _bank_tables(bank):
+    key = bank_key(bank)
+    with _tables_lock:
+        tables = _tables.get(key)
+        if tables is None or tables.bank is not bank:
+            tables = _tables[key] = _BankTables(bank)
+        return tables
+
+
+class MistakeAnalytics:
+    """Aggregates over one user's attempt log, held as NumPy arrays.
+
+    Running totals (attempts and errors per question, picks per question
+    and option) are updated from each batch of newly appended attempts
+    with np.bincount / np.add.at, so refresh() costs O(new attempts).
+    The trend is kept as attempts and errors per TREND_BUCKET. Derived
+    views are cached until the next batch arrives. The per-question
+    tables of the bank are shared by all users' engines (see _BankTables).
+    """
+
+    def __init__(self, bank, path=ATTEMPTS_FILE):
+        self.bank = bank
+        self.path = path
+        self._lock = threading.Lock()
+        self._tables = _bank_tables(bank)
+        self._day_of_gid = self._tables.day_of_gid
+        self._reset()
+
+    def _reset(self):
+        n = len(self.bank)
+        # Bumped for every day that gets new attempts (never goes back, also not here)
+        self.day_versions = getattr(self, "day_versions", np.zeros(self.bank.num_days + 1, np.int64)) + 1
+        self._offset = 0
+        self.attempts = np.zeros(n, np.int64)
+        self.errors = np.zeros(n, np.int64)
+        self.picks = np.zeros((n, MAX_OPTIONS), np.int64)
+        self._buckets = {}  # bucket start / TREND_BUCKET -> [attempts, errors]
+        self._cache = {}
+
+    # ─── Incremental ingestion ───────────────────────────────────────────
+    def refresh(self):
+        """Folds newly logged attempts into the totals; returns True if there were any."""
+        real_path = shard_path(self.path)
+        size = os.path.getsize(real_path) if os.path.exists(real_path) else 0
+        with self._lock:
+            if size < self._offset:
+                # The log was truncated or compacted: start over
+                self._reset()
+            if size == self._offset:
+                return False
+            events, self._offset = read_attempts(self.path, self._offset)
+            n = len(self.bank)
+            events = [e for e in events if 0 <= e.get("gid", -1) < n]
+            if not events:
+                return False
+            self._ingest(np.fromiter((e["gid"] for e in events), np.int64, len(events)),
+                         np.fromiter((e["mask"] for e in events), np.uint32, len(events)),
+                         np.fromiter((e["correct"] for e in events), bool, len(events)),
+                         np.fromiter((e["ts"] for e in events), np.float64, len(events)))
+            return True
+
+    def _ingest(self, gids, masks, correct, ts):
+        n = len(self.bank)
+        self.attempts += np.bincount(gids, minlength=n)
+        self.errors += np.bincount(gids[~correct], minlength=n)
+        rows, cols = np.nonzero(_bits(masks))
+        np.add.at(self.picks, (gids[rows], cols), 1)
+        np.add.at(self.day_versions, self._day_of_gid[gids], 1)
+        buckets, inverse = np.unique((ts // TREND_BUCKET).astype(np.int64), return_inverse=True)
+        attempts = np.bincount(inverse)
+        errors = np.bincount(inverse, weights=~correct)
+        for b, a, e in zip(buckets.tolist(), attempts.tolist(), errors.tolist()):
+            totals = self._buckets.setdefault(b, [0, 0])
+            totals[0] += a
+            totals[1] += int(e)
+        self._cache.clear()
+
+    def _cached(self, name, compute):
+        result = self._cache.get(name)
+        if result is None:
+            result = self._cache[name] = compute()
+        return result
+
+    # ─── Views ───────────────────────────────────────────────────────────
+    def summary(self):
+        total, errors = int(self.attempts.sum()), int(self.errors.sum())
+        return {"attempts": total, "errors": errors, "error_rate": errors / total if total else 0.0}
+
+    def per_day(self):
+        """Attempts, errors and error rate per study day."""
+        def compute():
+            days = self.bank.num_days + 1
+            attempts = np.bincount(self._day_of_gid, weights=self.attempts, minlength=days)[1:]
+            errors = np.bincount(self._day_of_gid, weights=self.errors, minlength=days)[1:]
+            rates = np.divide(errors, attempts, out=np.zeros_like(errors), where=attempts > 0)
+            return [{"day": d + 1, "attempts": int(a), "errors": int(e), "error_rate": float(r)}
+                    for d, (a, e, r) in enumerate(zip(attempts, errors, rates))]
+        return self._cached("per_day", compute)
+
+    def per_option(self):
+        """Error rate per option position: a wrong option picked or a right one left out."""
+        def compute():
+            answer_bits, valid = self._tables.options()
+            shown = self.attempts[:, None] * valid
+            wrong = np.where(answer_bits, self.attempts[:, None] - self.picks, self.picks) * valid
+            shown_sum, wrong_sum = shown.sum(axis=0), wrong.sum(axis=0)
+            return [{"option": chr(ord("A") + i), "attempts": int(shown_sum[i]),
+                     "error_rate": float(wrong_sum[i] / shown_sum[i])}
+                    for i in range(MAX_OPTIONS) if shown_sum[i]]
+        return self._cached("per_option", compute)
+
+    def hardest(self, k=10, min_attempts=2):
+        """The `k` questions with the highest error rate (at least `min_attempts` tries)."""
+        def compute():
+            rates = np.divide(self.errors, self.attempts, out=np.zeros(len(self.attempts)),
+                              where=self.attempts >= min_attempts)
+            top = self._top(rates, k)
+            return [{"gid": int(g), "label": self.bank.label(int(g)), "attempts": int(self.attempts[g]),
+                     "errors": int(self.errors[g]), "error_rate": float(rates[g])} for g in top]
+        return self._cached(("hardest", k, min_attempts), compute)
+
+    def confused(self, k=10):
+        """The `k` most often picked wrong options (question, distractor, picks)."""
+        def compute():
+            answer_bits, valid = self._tables.options()
+            distractor_picks = np.where(answer_bits | ~valid, 0, self.picks)
+            flat = distractor_picks.ravel()
+            result = []
+            for i in self._top(flat, k):
+                gid, option = divmod(int(i), MAX_OPTIONS)
+                letter = self.bank.option_letters(gid)[option]
+                result.append({"gid": gid, "label": self.bank.label(gid), "option": letter,
+                               "picks": int(flat[i])})
+            return result
+        return self._cached(("confused", k), compute)
+
+    def trend(self):
+        """Attempts and error rate per TREND_BUCKET (a day), oldest first."""
+        def compute():
+            return [{"start": b * TREND_BUCKET, "attempts": a, "error_rate": e / a}
+                    for b, (a, e) in sorted(self._buckets.items())]
+        return self._cached("trend", compute)
+
+    @staticmethod
+    def _top(values, k):
+        """Indices of the `k` largest positive values, largest first."""
+        k = min(k, int((values > 0).sum()))
+        if k <= 0:
+            return []
+        top = np.argpartition(values, -k)[-k:]
+        return top[np.argsort(values[top])[::-1]]
+
+
+def get_analytics(bank, path=ATTEMPTS_FILE):
+    """Returns the current user's analytics for `bank`, refreshed with any new attempts."""
+    key = (bank_key(bank), shard_path(path))
+    with _engines_lock:
+        engine = _engines.get(key)
+        if engine is None or engine.bank is not bank:
+            engine = _engines[key] = MistakeAnalytics(bank, path)
+            while len(_engines) > MAX_ENGINES:
+                _engines.popitem(last=False)
+        else:
+            _engines.move_to_end(key)
+    engine.refresh()
+    return engine
+
+
+def _drop_bank(key):
+    """Forgets an evicted bank's tables and every user's engine of it, so the bank can be freed."""
+    with _tables_lock:
+        _tables.pop(key, None)
+    with _engines_lock:
+        for engine_key in [k for k in _engines if k[0] == key]:
+            del _engines[engine_key]
+
+
+on_bank_evicted(_drop_bank)
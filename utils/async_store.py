@@ -0,0 +1,198 @@
+import atexit
+import copy
+import queue
+import threading
+import time
+from collections import defaultdict, deque
+
+from utils import profiling
+from utils.store import gid_in_range
+from utils.users import get_namespace, set_namespace
+
+MAX_PENDING = 10000
+LATENCY_WINDOW = 256
+LOCK_STRIPES = 64
+
+
+def _apply(data, op):
+    """Applies one queued mutation to a document, like the backends do."""
+    name, args = op
+    if name == "save":
+        data.clear()
+        data.update(copy.deepcopy(args[0]))
+    elif name == "update":
+        args[0](data)
+    elif name == "increment":
+        key, amount = args
+        data[key] = data.get(key, 0) + amount
+    elif name == "increment_many":
+        for key, amount in args[0].items():
+            data[key] = data.get(key, 0) + amount
+    elif name == "set_value":
+        key, value = args
+        if value is None:
+            data.pop(key, None)
+        else:
+            data[key] = copy.deepcopy(value)
+    elif name == "append_item":
+        key, item = args
+        items = data.setdefault(key, [])
+        if item not in items:
+            items.append(item)
+    elif name == "clear_mistake_range":
+        start, end = args
+        for k in [k for k in data if gid_in_range(k, start, end)]:
+            del data[k]
+
+
+class AsyncStore:
+    """Moves a backend's writes onto one background writer thread.
+
+    Mutations are queued (bounded; a full queue blocks the caller) and
+    return immediately. Until the writer has applied them, they are also
+    kept per (user, bank, path) and replayed over every read, so a user always
+    sees their own pending writes. The writer and a reader of the same
+    (user, bank, path) share one of LOCK_STRIPES locks, so a queued op is
+    never both in the backend and in the overlay; other users' writes do
+    not hold up the read, and a document without pending ops is read
+    without any lock.
+    """
+
+    def __init__(self, backend, max_pending=MAX_PENDING):
+        self.backend = backend
+        self._queue = queue.Queue(maxsize=max_pending)
+        self._pending = defaultdict(deque)
+        self._pending_lock = threading.Lock()
+        self._apply_locks = [threading.Lock() for _ in range(LOCK_STRIPES)]
+        self._latencies = deque(maxlen=LATENCY_WINDOW)
+        self.applied = 0
+        self.failed = 0
+        self._thread = threading.Thread(target=self._run, name="store-writer", daemon=True)
+        self._thread.start()
+
+    # ─── Writer side ─────────────────────────────────────────────────────
+    def _enqueue(self, path, name, *args):
+        namespace = get_namespace()
+        op = (name, args)
+        with self._pending_lock:
+            self._pending[(namespace, path)].append(op)
+        self._queue.put((namespace, path, op, time.perf_counter()))
+        if profiling.ENABLED:
+            profiling.set_gauge("store_queue_depth", self._queue.qsize())
+
+    def _run(self):
+        while True:
+            namespace, path, op, queued_at = self._queue.get()
+            try:
+                set_namespace(namespace)
+                name, args = op
+                with self._lock_for((namespace, path)):
+                    try:
+                        getattr(self.backend, name)(path, *args)
+                        self.applied += 1
+                    except Exception as e:
+                        self.failed += 1
+                        print(f"Error writing {path}: {e}")
+                    with self._pending_lock:
+                        pending = self._pending[(namespace, path)]
+                        pending.popleft()
+                        if not pending:
+                            del self._pending[(namespace, path)]
+                latency = time.perf_counter() - queued_at
+                self._latencies.append(latency)
+                if profiling.ENABLED:
+                    profiling.set_gauge("store_queue_depth", self._queue.qsize())
+                    profiling.set_gauge("store_write_latency_seconds", latency)
+            finally:
+                self._queue.task_done()
+
+    def stats(self):
+        """Queue depth and write latency (enqueue -> applied) over the recent window."""
+        latencies = sorted(self._latencies)
+        return {
+            "queue_depth": self._queue.qsize(),
+            "applied": self.applied,
+            "failed": self.failed,
+            "latency_ms_avg": sum(latencies) / len(latencies) * 1000 if latencies else 0.0,
+            "latency_ms_max": latencies[-1] * 1000 if latencies else 0.0,
+        }
+
+    # ─── Reads (backend state + own pending writes) ─────────────────────
+    def _lock_for(self, key):
+        return self._apply_locks[hash(key) % LOCK_STRIPES]
+
+    def _overlay(self, path, read):
+        key = (get_namespace(), path)
+        if key not in self._pending:
+            # Nothing of this user's queued for `path`: ops enqueued from now
+            # on are newer than this read and are left out, like any later write
+            return read()
+        with self._lock_for(key):
+            data = read()
+            with self._pending_lock:
+                ops = list(self._pending.get(key, ()))
+        # Backend reads are private copies, so the ops are applied in place
+        for op in ops:
+            _apply(data, op)
+        return data
+
+    def load(self, path, default=None):
+        data = self._overlay(path, lambda: self.backend.load(path, default))
+        if not data and default is not None:
+            return default
+        return data
+
+    def load_mistake_range(self, path, start, end):
+        if (get_namespace(), path) in self._pending:
+            # A queued update may move counters into the range (see
+            # utils.utils.convert_legacy_keys): replay it over the whole document
+            data = self._overlay(path, lambda: self.backend.load(path, {}))
+        else:
+            data = self.backend.load_mistake_range(path, start, end)
+        return {k: v for k, v in data.items() if gid_in_range(k, start, end)}
+
+    # ─── Writes (queued) ─────────────────────────────────────────────────
+    def save(self, path, data):
+        self._enqueue(path, "save", copy.deepcopy(data))
+
+    def update(self, path, func, default=None):
+        """Queues `func`; its result is computed now on the user's current view.
+
+        `func` therefore runs twice (once here, once in the writer) and
+        must only change top-level entries of the document it is given
+        (see JsonStore.update).
+        """
+        result = func(self.load(path, default))
+        self._enqueue(path, "update", func, default)
+        return result
+
+    def increment(self, path, key, amount=1):
+        self._enqueue(path, "increment", key, amount)
+        return self.load(path, {}).get(key, 0)
+
+    def increment_many(self, path, counts):
+        self._enqueue(path, "increment_many", dict(counts))
+
+    def set_value(self, path, key, value):
+        self._enqueue(path, "set_value", key, copy.deepcopy(value))
+
+    def append_item(self, path, key, item):
+        self._enqueue(path, "append_item", key, item)
+
+    def clear_mistake_range(self, path, start, end):
+        self._enqueue(path, "clear_mistake_range", start, end)
+
+    def flush(self, path=None):
+        """Waits for every queued write, then flushes the backend."""
+        self._queue.join()
+        self.backend.flush(path)
+
+    def invalidate(self, path=None):
+        self._queue.join()
+        self.backend.invalidate(path)
+
+
+def wrap_async(backend):
+    store = AsyncStore(backend)
+    atexit.register(store.flush)
+    return store
@@ -0,0 +1,282 @@
+import atexit
+import json
+import os
+import threading
+import time
+from collections import defaultdict
+
+from utils import profiling
+from utils.grading import option_mask
+from utils.profiling import timed
+from utils.users import get_current_user, get_namespace, set_namespace, shard_path
+
+# One JSON object per line; appending never rewrites earlier attempts.
+# The log is the source of truth for answers: the mistake counters and
+# answered-id lists are snapshots that compact() folds it into.
+ATTEMPTS_FILE = "day_practice/data/attempts.jsonl"
+CHECKPOINT_FILE = "day_practice/data/attempts_checkpoint.json"
+COMPACT_INTERVAL_ENV = "STUDY_COMPACT_INTERVAL"
+DEFAULT_COMPACT_INTERVAL = 10.0
+# Appends from this process update the tail directly; the log file itself
+# is checked for other changes (e.g. removed by hand) at most this often
+RECHECK_INTERVAL = 1.0
+# A user's fully folded tail is forgotten after this long without answers
+# or reads (seconds); the next access starts again from the checkpoint
+IDLE_SECONDS = 300.0
+LOCK_STRIPES = 64
+
+# scope -> snapshot that wrong answers / answered positions are folded into
+MISTAKE_FILES = {
+    "day": "day_practice/data/day_mistakes.json",
+    "quiz": "day_practice/data/day_mistakes.json",
+    "bulk": "bulk_practice/data/bulk_mistakes.json",
+}
+ANSWERED_FILES = {
+    "day": "day_practice/data/day_answered_ids.json",
+    "bulk": "bulk_practice/data/bulk_answered_ids.json",
+}
+FOLDED_FILES = frozenset(MISTAKE_FILES.values()) | frozenset(ANSWERED_FILES.values())
+
+# One user's log is only touched under its stripe lock, so appends and
+# reads of other users' logs do not wait for each other
+_locks = [threading.RLock() for _ in range(LOCK_STRIPES)]
+_compactor_lock = threading.Lock()
+_tails = {}  # ((user, bank), log path) -> _Tail
+_compactor = []
+
+
+class _Tail:
+    """The part of one user's log that is not folded into the snapshots yet."""
+
+    def __init__(self, checkpoint, used=None):
+        self.folded = checkpoint  # byte offset covered by the snapshots
+        self.read = checkpoint    # byte offset parsed into the fields below
+        self.checked = 0.0        # time.monotonic() of the last look at the file
+        self.used = time.monotonic() if used is None else used  # ... of the last append or read
+        self.mistakes = defaultdict(lambda: defaultdict(int))  # file -> gid (str) -> count
+        self.answered = defaultdict(lambda: defaultdict(list))  # file -> round -> positions
+
+    def __bool__(self):
+        return self.read > self.folded
+
+    def add(self, event):
+        scope = event.get("scope")
+        if not event.get("correct") and scope in MISTAKE_FILES and "gid" in event:
+            self.mistakes[MISTAKE_FILES[scope]][str(event["gid"])] += 1
+        if "round" in event and scope in ANSWERED_FILES:
+            positions = self.answered[ANSWERED_FILES[scope]][event["round"]]
+            if event["pos"] not in positions:
+                positions.append(event["pos"])
+
+
+def _lock_for(path):
+    return _locks[hash((get_namespace(), path)) % LOCK_STRIPES]
+
+
+# ─── Appending ──────────────────────────────────────────────────────────
+def card_timer(state, card):
+    """Returns when `card` was first shown in this mode (for answer latency)."""
+    if state.get("timer_card") != card:
+        state.timer_card = card
+        state.timer_started = time.time()
+    return state.timer_started
+
+
+def record_attempt(bank, gid, selected, correct, scope, started=None, answered=None,
+                   path=ATTEMPTS_FILE):
+    """Appends one answered question (right or wrong) to the current user's attempt log.
+
+    `started` is when the card was shown (see card_timer); `answered` is an
+    optional (round key, position) to add to the scope's answered ids.
+    """
+    record_attempts(bank, [(gid, selected, correct)], scope, started, answered, path)
+
+
+@timed()
+def record_attempts(bank, answers, scope, started=None, answered=None, path=ATTEMPTS_FILE):
+    """Appends (gid, selected, correct) answers in one write, e.g. a submitted quiz."""
+    now = time.time()
+    user = get_current_user()
+    events, lines = [], []
+    for gid, selected, correct in answers:
+        event = {
+            "ts": round(now, 3),
+            "user": user,
+            "gid": gid,
+            "mask": option_mask(bank.option_letters(gid), selected),
+            "correct": bool(correct),
+            "scope": scope,
+        }
+        if started is not None:
+            event["ms"] = int((now - started) * 1000)
+        if answered is not None:
+            event["round"], event["pos"] = answered
+        events.append(event)
+        lines.append(json.dumps(event, separators=(",", ":")) + "\n")
+    if not lines:
+        return
+    real_path = shard_path(path)
+    payload = "".join(lines).encode("utf-8")
+    with _lock_for(path):
+        try:
+            f = open(real_path, "ab")
+        except FileNotFoundError:
+            # First answer of this user (or bank): create the shard directory
+            os.makedirs(os.path.dirname(real_path), exist_ok=True)
+            f = open(real_path, "ab")
+        with f:
+            f.write(payload)
+            end = f.tell()
+        tail = _tails.get((get_namespace(), path))
+        if tail is not None and tail.read == end - len(payload):
+            # Nothing else was appended since the tail was read: fold these
+            # events in directly instead of reading them back from the file
+            for event in events:
+                tail.add(event)
+            tail.read = end
+        else:
+            if tail is not None:
+                tail.checked = 0.0
+            tail = _tail(path)
+        tail.used = time.monotonic()
+    profiling.add_bytes("written", len(payload))
+    _start_compactor()
+
+
+# ─── Reading ────────────────────────────────────────────────────────────
+def _read(real_path, offset):
+    events = []
+    with open(real_path, "rb") as f:
+        f.seek(offset)
+        for raw in f:
+            if not raw.endswith(b"\n"):
+                break
+            offset += len(raw)
+            try:
+                events.append(json.loads(raw))
+            except ValueError:
+                continue
+    return events, offset
+
+
+def read_attempts(path=ATTEMPTS_FILE, offset=0):
+    """Returns (events, new_offset) for the attempts appended after byte `offset`.
+
+    A partially written last line is left for the next call.
+    """
+    real_path = shard_path(path)
+    if not os.path.exists(real_path):
+        return [], 0
+    return _read(real_path, offset)
+
+
+def _tail(path):
+    """The current user's unfolded tail, brought up to date with the log (hold _lock_for(path)).
+
+    The file is only looked at again after RECHECK_INTERVAL; this process's
+    own appends are added by record_attempts as they are written.
+    """
+    from utils.utils import store
+
+    key = (get_namespace(), path)
+    tail = _tails.get(key)
+    now = time.monotonic()
+    if tail is not None and now - tail.checked < RECHECK_INTERVAL:
+        return tail
+    real_path = shard_path(path)
+    try:
+        size = os.stat(real_path).st_size
+    except FileNotFoundError:
+        size = 0
+    if tail is None:
+        # Crash recovery: whatever lies past the checkpoint is replayed
+        checkpoint = store.load(CHECKPOINT_FILE, {}).get("offset", 0)
+        tail = _tails[key] = _Tail(min(checkpoint, size))
+    elif size < tail.read:
+        # The log was truncated or removed; nothing left to fold
+        tail = _tails[key] = _Tail(size)
+    if size > tail.read:
+        events, tail.read = _read(real_path, tail.read)
+        for event in events:
+            tail.add(event)
+    tail.checked = now
+    return tail
+
+
+def pending(target, path=ATTEMPTS_FILE):
+    """Returns ({gid: count}, {round: [positions]}) logged for `target` but not yet folded."""
+    if target not in FOLDED_FILES:
+        return {}, {}
+    with _lock_for(path):
+        tail = _tail(path)
+        tail.used = time.monotonic()
+        if not tail:
+            return {}, {}
+        return (dict(tail.mistakes.get(target, {})),
+                {k: list(v) for k, v in tail.answered.get(target, {}).items()})
+
+
+# ─── Compaction ─────────────────────────────────────────────────────────
+def compact(path=ATTEMPTS_FILE):
+    """Folds the current user's unfolded attempts into the snapshots.
+
+    The counters are written before the checkpoint, so a crash in between
+    replays (and counts twice) that batch instead of losing it.
+    """
+    from utils.utils import store
+
+    with _lock_for(path):
+        tail = _tail(path)
+        if not tail:
+            return False
+        for target, counts in tail.mistakes.items():
+            if counts:
+                store.increment_many(target, dict(counts))
+        for target, rounds in tail.answered.items():
+            for round_key, positions in rounds.items():
+                for position in positions:
+                    store.append_item(target, round_key, position)
+        store.set_value(CHECKPOINT_FILE, "offset", tail.read)
+        _tails[(get_namespace(), path)] = _Tail(tail.read, tail.used)
+        return True
+
+
+def _forget_if_idle(path, now):
+    """Drops the current user's tail if it is fully folded and unused for IDLE_SECONDS."""
+    with _lock_for(path):
+        key = (get_namespace(), path)
+        tail = _tails.get(key)
+        if tail is not None and not tail and now - tail.used > IDLE_SECONDS:
+            del _tails[key]
+
+
+def compact_all():
+    """Compacts the log of every user seen by this process and forgets idle users."""
+    now = time.monotonic()
+    for namespace, path in list(_tails):
+        set_namespace(namespace)
+        try:
+            compact(path)
+            _forget_if_idle(path, now)
+        except Exception as e:
+            print(f"Error compacting attempts of {namespace[0]}: {e}")
+
+
+def _run_compactor(interval):
+    while True:
+        time.sleep(interval)
+        compact_all()
+
+
+def _start_compactor():
+    if _compactor:
+        return
+    with _compactor_lock:
+        if _compactor:
+            return
+        interval = float(os.environ.get(COMPACT_INTERVAL_ENV, DEFAULT_COMPACT_INTERVAL))
+        thread = threading.Thread(target=_run_compactor, args=(interval,), name="attempt-compactor",
+                                  daemon=True)
+        thread.start()
+        _compactor.append(thread)
+        atexit.register(compact_all)
@@ -0,0 +1,180 @@
+import hashlib
+import json
+import mmap
+import os
+import struct
+import sys
+from collections.abc import Mapping
+from types import MappingProxyType
+
+from utils.store import atomic_write_bytes
+
+COMPILED_SUFFIX = ".qbank"
+MAGIC = b"QBANK001"
+MAX_OPTIONS = 32
+
+# magic, questions, options, strings, blob size, sha1 of the source file
+HEADER = struct.Struct("<8sIIIQ20s")
+# question, instruction (string ids), first option, option count, answer bitmask
+RECORD = struct.Struct("<IIIHxxI")
+# option key, option text (string ids)
+OPTION = struct.Struct("<II")
+OFFSET = struct.Struct("<Q")
+
+
+def compiled_path(path):
+    """questions.json -> questions.qbank"""
+    return os.path.splitext(path)[0] + COMPILED_SUFFIX
+
+
+def compile_bank(questions, source_digest=b"\0" * 20):
+    """Encodes questions as one string table plus fixed-width records.
+
+    Identical strings (option letters, instructions) are stored once.
+    Answers become a bitmask over the question's options, in option order.
+    """
+    strings = {}
+
+    def intern(text):
+        sid = strings.get(text)
+        if sid is None:
+            sid = strings[text] = len(strings)
+        return sid
+
+    records, options = [], []
+    for gid, q in enumerate(questions):
+        opts = list(q.get("options", {}).items())
+        if len(opts) > MAX_OPTIONS:
+            raise ValueError(f"Question {gid} has more than {MAX_OPTIONS} options")
+        letters = [k for k, _ in opts]
+        mask = 0
+        for answer in q.get("answers", []):
+            if answer not in letters:
+                raise ValueError(f"Question {gid}: answer {answer!r} is not one of its options")
+            mask |= 1 << letters.index(answer)
+        records.append(RECORD.pack(intern(q.get("question", "")), intern(q.get("instruction", "")),
+                                   len(options), len(opts), mask))
+        options.extend(OPTION.pack(intern(k), intern(v)) for k, v in opts)
+
+    blobs = [s.encode("utf-8") for s in strings]
+    offsets, pos = [], 0
+    for blob in blobs:
+        offsets.append(OFFSET.pack(pos))
+        pos += len(blob)
+    offsets.append(OFFSET.pack(pos))
+
+    header = HEADER.pack(MAGIC, len(records), len(options), len(blobs), pos, source_digest)
+    return b"".join([header] + records + options + offsets + blobs)
+
+
+def compile_file(source, target=None):
+    """Compiles a questions.json file next to it (or to `target`)."""
+    with open(source, "rb") as f:
+        raw = f.read()
+    data = compile_bank(json.loads(raw.decode("utf-8")), hashlib.sha1(raw).digest())
+    target = target or compiled_path(source)
+    atomic_write_bytes(target, data)
+    return target
+
+
+def source_digest(path):
+    """Returns the hex sha1 of the source a compiled bank was built from."""
+    with open(path, "rb") as f:
+        header = f.read(HEADER.size)
+    if len(header) < HEADER.size:
+        return None
+    magic, *_, digest = HEADER.unpack(header)
+    return digest.hex() if magic == MAGIC else None
+
+
+class CompiledQuestion(Mapping):
+    """Read-only dict-like view of one record of a CompiledQuestions bank."""
+
+    __slots__ = ("_bank", "_gid")
+    _KEYS = ("question", "instruction", "options", "answers")
+
+    def __init__(self, bank, gid):
+        self._bank = bank
+        self._gid = gid
+
+    def __getitem__(self, key):
+        bank = self._bank
+        question, instruction, first, count, mask = bank.record(self._gid)
+        if key == "question":
+            return bank.string(question)
+        if key == "instruction":
+            return bank.string(instruction)
+        if key == "options":
+            return MappingProxyType(dict(bank.option(first + i) for i in range(count)))
+        if key == "answers":
+            return tuple(bank.string(bank.option_key(first + i)) for i in range(count) if mask >> i & 1)
+        raise KeyError(key)
+
+    def __iter__(self):
+        return iter(self._KEYS)
+
+    def __len__(self):
+        return len(self._KEYS)
+
+    @property
+    def answer_mask(self):
+        return self._bank.record(self._gid)[4]
+
+
+class CompiledQuestions:
+    """Question sequence backed by a read-only memory map of a .qbank file.
+
+    Every worker process maps the same file, so the pages are shared and
+    nothing is decoded until a field is read.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as f:
+            self._buf = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self._count, num_options, num_strings, _, digest = HEADER.unpack_from(self._buf, 0)
+        if magic != MAGIC:
+            raise ValueError(f"Not a compiled question bank: {path}")
+        self.source_digest = digest.hex()
+        self._records_at = HEADER.size
+        self._options_at = self._records_at + self._count * RECORD.size
+        self._offsets_at = self._options_at + num_options * OPTION.size
+        self._blob_at = self._offsets_at + (num_strings + 1) * OFFSET.size
+
+    def __len__(self):
+        return self._count
+
+    def record(self, gid):
+        return RECORD.unpack_from(self._buf, self._records_at + gid * RECORD.size)
+
+    def option_key(self, oid):
+        return OPTION.unpack_from(self._buf, self._options_at + oid * OPTION.size)[0]
+
+    def option(self, oid):
+        key, text = OPTION.unpack_from(self._buf, self._options_at + oid * OPTION.size)
+        return self.string(key), self.string(text)
+
+    def string(self, sid):
+        start, = OFFSET.unpack_from(self._buf, self._offsets_at + sid * OFFSET.size)
+        end, = OFFSET.unpack_from(self._buf, self._offsets_at + (sid + 1) * OFFSET.size)
+        return self._buf[self._blob_at + start:self._blob_at + end].decode("utf-8")
+
+    def __getitem__(self, item):
+        if isinstance(item, slice):
+            return tuple(CompiledQuestion(self, i) for i in range(*item.indices(self._count)))
+        if item < 0:
+            item += self._count
+        if not 0 <= item < self._count:
+            raise IndexError("question index out of range")
+        return CompiledQuestion(self, item)
+
+    def __iter__(self):
+        for i in range(self._count):
+            yield CompiledQuestion(self, i)
+
+
+if __name__ == "__main__":
+    # python -m utils.bank_format [questions.json [target.qbank]]
+    src = sys.argv[1] if len(sys.argv) > 1 else "questions.json"
+    out = compile_file(src, sys.argv[2] if len(sys.argv) > 2 else None)
+    print(f"Compiled {src} -> {out}")
@@ -0,0 +1,172 @@
+import array
+import json
+import mmap
+import os
+import re
+import tempfile
+import threading
+from collections import OrderedDict
+
+# Banks at least this large (or any .jsonl bank) are indexed and read lazily
+STREAM_THRESHOLD_ENV = "STUDY_STREAM_THRESHOLD"
+STREAM_THRESHOLD = 8 * 1024 * 1024
+CACHE_SIZE = 512
+
+INDEX_SUFFIX = ".idx"
+_INDEX_MAGIC = b"QIDX1"
+
+# A whole string literal (skipped) or one structural character
+_TOKEN_RE = re.compile(rb'"(?:[^"\\]|\\.)*"|[\[\]{},]', re.DOTALL)
+
+
+def stream_threshold():
+    try:
+        return int(os.environ.get(STREAM_THRESHOLD_ENV, STREAM_THRESHOLD))
+    except ValueError:
+        return STREAM_THRESHOLD
+
+
+def should_stream(path):
+    """Whether `path` is better served by a LazyQuestions than a full json.load."""
+    return path.endswith(".jsonl") or os.path.getsize(path) >= stream_threshold()
+
+
+def scan_json_array(buf):
+    """Returns the (starts, ends) byte offsets of the elements of a top-level JSON array.
+
+    Only structural characters and string literals are visited, so no
+    element is decoded. An end offset points at the "," or "]" that closes
+    the element; the whitespace before it is harmless to json.loads.
+    """
+    starts, ends = array.array("Q"), array.array("Q")
+    depth = 0
+    open_start = None
+    pos = 0
+    for match in _TOKEN_RE.finditer(buf):
+        token = match.group()
+        if depth == 1 and open_start is None and token not in (b",", b"]"):
+            open_start = match.start()
+        if token in (b"[", b"{"):
+            depth += 1
+        elif token in (b"]", b"}"):
+            depth -= 1
+            if depth == 0:
+                pos = match.start()
+                break
+        elif token == b"," and depth == 1:
+            starts.append(open_start)
+            ends.append(match.start())
+            open_start = None
+    else:
+        raise ValueError("Question bank is not a complete JSON array")
+    if open_start is not None:
+        starts.append(open_start)
+        ends.append(pos)
+    return starts, ends
+
+
+def scan_json_lines(buf):
+    """Returns the (starts, ends) byte offsets of the non-blank lines of a JSON Lines file."""
+    starts, ends = array.array("Q"), array.array("Q")
+    for match in re.finditer(rb"[^\r\n]+", buf):
+        if match.group().strip():
+            starts.append(match.start())
+            ends.append(match.end())
+    return starts, ends
+
+
+def _index_header(path):
+    st = os.stat(path)
+    return b"%s %d %d\n" % (_INDEX_MAGIC, st.st_size, st.st_mtime_ns)
+
+
+def _read_index(path):
+    try:
+        with open(path + INDEX_SUFFIX, "rb") as f:
+            header = f.readline()
+            if header != _index_header(path):
+                return None
+            offsets = array.array("Q")
+            offsets.frombytes(f.read())
+    except (OSError, ValueError):
+        return None
+    half = len(offsets) // 2
+    return offsets[:half], offsets[half:]
+
+
+def _write_index(path, starts, ends):
+    """Saves the index next to the bank; read-only deployments just skip it."""
+    directory = os.path.dirname(path) or "."
+    try:
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".tmp_", suffix=INDEX_SUFFIX)
+    except OSError:
+        return
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(_index_header(path))
+            f.write(starts.tobytes())
+            f.write(ends.tobytes())
+        os.replace(tmp_path, path + INDEX_SUFFIX)
+    except OSError:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+
+
+def load_offset_index(path, buf):
+    """Returns the element offsets of `path`, scanning `buf` only if the saved index is stale."""
+    index = _read_index(path)
+    if index is None:
+        scan = scan_json_lines if path.endswith(".jsonl") else scan_json_array
+        index = scan(buf)
+        _write_index(path, *index)
+    return index
+
+
+class LazyQuestions:
+    """Read-only sequence of questions decoded on demand from a memory-mapped bank.
+
+    Only the offset index is resident; each question is parsed (and passed
+    through `freeze`) the first time it is accessed and kept in a small
+    LRU cache.
+    """
+
+    def __init__(self, path, freeze=None, cache_size=CACHE_SIZE):
+        self.path = path
+        self._freeze = freeze or (lambda q: q)
+        self._cache_size = cache_size
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+        with open(path, "rb") as f:
+            self._buf = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self._starts, self._ends = load_offset_index(path, self._buf)
+
+    def __len__(self):
+        return len(self._starts)
+
+    def _load(self, i):
+        with self._lock:
+            q = self._cache.get(i)
+            if q is not None:
+                self._cache.move_to_end(i)
+                return q
+        q = self._freeze(json.loads(self._buf[self._starts[i]:self._ends[i]]))
+        with self._lock:
+            self._cache[i] = q
+            while len(self._cache) > self._cache_size:
+                self._cache.popitem(last=False)
+        return q
+
+    def __getitem__(self, item):
+        if isinstance(item, slice):
+            return tuple(self._load(i) for i in range(*item.indices(len(self))))
+        if item < 0:
+            item += len(self)
+        if not 0 <= item < len(self):
+            raise IndexError("question index out of range")
+        return self._load(item)
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self._load(i)
@@ -0,0 +1,55 @@
+import os
+import time
+
+from utils.users import DEFAULT_BANK, get_current_bank, sanitize_user_id
+
+# Every questions file in STUDY_BANKS_DIR (default "banks/") is a bank named
+# after the file; the bundled questions.json is the "default" bank.
+BANKS_DIR_ENV = "STUDY_BANKS_DIR"
+DEFAULT_BANKS_DIR = "banks"
+DEFAULT_BANK_FILE = "questions.json"
+BANK_SUFFIXES = (".json", ".jsonl", ".qbank")
+# The banks directory is checked for changes at most this often (seconds)
+RESCAN_INTERVAL = 1.0
+
+_listing = {}  # banks dir -> (time of the last check, mtime, {bank id: path})
+
+
+def banks_dir():
+    return os.environ.get(BANKS_DIR_ENV, DEFAULT_BANKS_DIR)
+
+
+def available_banks():
+    """Returns {bank id: path}, the default bank first; rescans only when the directory changed."""
+    directory = banks_dir()
+    banks = {DEFAULT_BANK: DEFAULT_BANK_FILE}
+    now = time.monotonic()
+    cached = _listing.get(directory)
+    if cached is not None and now - cached[0] < RESCAN_INTERVAL:
+        banks.update(cached[2])
+        return banks
+    if not os.path.isdir(directory):
+        _listing[directory] = (now, None, {})
+        return banks
+    mtime = os.stat(directory).st_mtime_ns
+    found = cached[2] if cached is not None and cached[1] == mtime else None
+    if found is None:
+        found = {}
+        for filename in sorted(os.listdir(directory)):
+            stem, suffix = os.path.splitext(filename)
+            if suffix not in BANK_SUFFIXES or stem.endswith(".aliases"):
+                continue
+            bank_id = sanitize_user_id(stem)
+            # questions.json and its compiled questions.qbank are one bank
+            if bank_id not in found or suffix != ".qbank":
+                found[bank_id] = os.path.join(directory, filename)
+        found.pop(DEFAULT_BANK, None)
+    _listing[directory] = (now, mtime, found)
+    banks.update(found)
+    return banks
+
+
+def bank_path(bank_id=None):
+    """The questions file of `bank_id` (default: the current bank, see utils.users)."""
+    banks = available_banks()
+    return banks.get(bank_id or get_current_bank(), DEFAULT_BANK_FILE)
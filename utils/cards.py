@@ -0,0 +1,37 @@
+from collections import namedtuple
+
+_CardFields = namedtuple("Card", "question instruction options answer answer_text body")
+
+
+class Card(_CardFields):
+    """Display strings of one question, built once per bank (see QuestionBank.card).
+
+    options:     ((letter, "A: text"), ...) for checkbox labels
+    answer:      "A, C" (sorted correct letters)
+    answer_text: the correct options' texts, comma separated
+    body:        question, instruction, options and answer as one markdown block
+    """
+
+    __slots__ = ()
+
+    def markdown(self, header, note=""):
+        """One markdown element for a review page: "**header** body", `note`, separator."""
+        return f"**{header}** {self.body}{note}\n\n---"
+
+
+def build_card(q, answer_letters):
+    options = q.get("options", {})
+    question = q.get("question", "")
+    instruction = q.get("instruction", "")
+    answer = ", ".join(answer_letters)
+    option_lines = "\n".join(f"- {k}: {v}" for k, v in options.items())
+    body = (f"{question}\n\n> {instruction}\n\n{option_lines}\n\n"
+            f":green[✅ Correct Answer(s): {answer}]")
+    return Card(
+        question=question,
+        instruction=instruction,
+        options=tuple((k, f"{k}: {v}") for k, v in options.items()),
+        answer=answer,
+        answer_text=", ".join(options[k] for k in answer_letters if k in options),
+        body=body,
+    )
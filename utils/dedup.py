@@ -0,0 +1,148 @@
+import argparse
+import json
+import sys
+import zlib
+from collections import defaultdict
+
+import numpy as np
+
+from utils.question_bank import QuestionBank, _file_digest, aliases_path
+from utils.search import tokenize
+from utils.store import atomic_write_bytes
+
+# 128 hash functions in 32 bands of 4 rows: pairs down to ~0.4 Jaccard
+# usually share a band, so the exact check below decides the threshold.
+NUM_PERM = 128
+BANDS = 32
+ROWS = NUM_PERM // BANDS
+DEFAULT_THRESHOLD = 0.8
+_MASK = np.uint64(0xFFFFFFFF)
+
+
+def shingles(q):
+    """Word bigrams of the question and of its option texts (option order ignored)."""
+    result = set()
+    options = sorted(" ".join(tokenize(text)) for text in q.get("options", {}).values())
+    for text in [" ".join(tokenize(q.get("question", "")))] + options:
+        words = text.split()
+        grams = zip(words, words[1:]) if len(words) > 1 else ((w,) for w in words)
+        result.update(zlib.crc32(" ".join(g).encode("utf-8")) for g in grams)
+    return result
+
+
+def minhash(shingle_sets, seed=1):
+    """(n, NUM_PERM) MinHash signatures, using (a*x + b) mod 2**32 as the permutations."""
+    rng = np.random.default_rng(seed)
+    a = rng.integers(1, 1 << 32, NUM_PERM, dtype=np.uint64) | np.uint64(1)
+    b = rng.integers(0, 1 << 32, NUM_PERM, dtype=np.uint64)
+    signatures = np.full((len(shingle_sets), NUM_PERM), 0xFFFFFFFF, dtype=np.uint64)
+    for i, items in enumerate(shingle_sets):
+        if items:
+            x = np.fromiter(items, np.uint64, len(items))
+            signatures[i] = ((a[:, None] * x[None, :] + b[:, None]) & _MASK).min(axis=1)
+    return signatures
+
+
+def candidate_pairs(signatures):
+    """Pairs of rows that agree on all rows of at least one band (LSH)."""
+    pairs = set()
+    for band in range(BANDS):
+        buckets = defaultdict(list)
+        block = np.ascontiguousarray(signatures[:, band * ROWS:(band + 1) * ROWS])
+        for i, row in enumerate(block):
+            buckets[row.tobytes()].append(i)
+        for members in buckets.values():
+            for x in range(len(members)):
+                for y in range(x + 1, len(members)):
+                    pairs.add((members[x], members[y]))
+    return pairs
+
+
+def find_duplicates(questions, threshold=DEFAULT_THRESHOLD):
+    """Returns clusters (sorted gid lists) of questions whose shingle Jaccard is >= threshold."""
+    sets = [shingles(q) for q in questions]
+    parent = list(range(len(sets)))
+
+    def root(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    for i, j in candidate_pairs(minhash(sets)):
+        union = len(sets[i] | sets[j])
+        if union and len(sets[i] & sets[j]) / union >= threshold:
+            parent[root(j)] = root(i)
+
+    clusters = defaultdict(list)
+    for gid in range(len(sets)):
+        clusters[root(gid)].append(gid)
+    return sorted((members for members in clusters.values() if len(members) > 1), key=lambda c: c[0])
+
+
+def _answer_texts(q):
+    options = q.get("options", {})
+    return frozenset(" ".join(tokenize(options.get(k, ""))) for k in q.get("answers", []))
+
+
+def alias_map(bank, clusters):
+    """{duplicate gid: canonical gid}, the canonical being each cluster's first question.
+
+    Duplicates whose correct answers differ from the canonical one are left
+    out and returned as conflicts instead.
+    """
+    aliases, conflicts = {}, []
+    for cluster in clusters:
+        canonical = cluster[0]
+        answers = _answer_texts(bank[canonical])
+        for gid in cluster[1:]:
+            if _answer_texts(bank[gid]) == answers:
+                aliases[gid] = canonical
+            else:
+                conflicts.append((canonical, gid))
+    return aliases, conflicts
+
+
+def _write_json(path, data):
+    atomic_write_bytes(path, json.dumps(data, indent=2, ensure_ascii=False).encode("utf-8"))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Find near-duplicate questions with MinHash/LSH.")
+    parser.add_argument("bank", nargs="?", default="questions.json")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help="minimum Jaccard similarity of question/option word bigrams")
+    parser.add_argument("--aliases", action="store_true",
+                        help=f"write the duplicate -> canonical gid map next to the bank "
+                             f"(questions.json -> {aliases_path('questions.json')})")
+    parser.add_argument("--output", help="also write the bank without duplicates to this file")
+    args = parser.parse_args(argv)
+
+    with open(args.bank, "r", encoding="utf-8") as f:
+        questions = json.load(f)
+    bank = QuestionBank(questions, path=args.bank)
+    clusters = find_duplicates(questions, args.threshold)
+    aliases, conflicts = alias_map(bank, clusters)
+
+    for cluster in clusters:
+        print(f"{len(cluster)} similar: " + ", ".join(bank.label(gid) for gid in cluster))
+        for gid in cluster:
+            print(f"    {bank.label(gid)}: {questions[gid].get('question', '')[:90]}")
+    for canonical, gid in conflicts:
+        print(f"Not merged (different answers): {bank.label(gid)} ~ {bank.label(canonical)}")
+    print(f"{len(clusters)} cluster(s), {len(aliases)} duplicate(s) of {len(questions)} questions")
+
+    if args.aliases:
+        target = aliases_path(args.bank)
+        _write_json(target, {"source_digest": _file_digest(args.bank), "aliases": aliases})
+        print(f"Wrote {target}")
+    if args.output:
+        duplicates = set(aliases)
+        _write_json(args.output, [q for gid, q in enumerate(questions) if gid not in duplicates])
+        print(f"Wrote {args.output} ({len(questions) - len(duplicates)} questions)")
+    return 0
+
+
+if __name__ == "__main__":
+    # python -m utils.dedup [questions.json] [--threshold 0.8] [--aliases] [--output deduped.json]
+    sys.exit(main())
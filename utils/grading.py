@@ -0,0 +1,50 @@
+from collections import namedtuple
+
+# hits: correct options picked, misses: correct options left out,
+# false_picks: wrong options picked
+Grade = namedtuple("Grade", "correct hits misses false_picks")
+
+
+def _popcount(mask):
+    return bin(mask).count("1")
+
+
+def option_mask(letters, chosen):
+    """Encodes the chosen option letters as a bitmask over `letters` (bit i = letters[i]).
+
+    Letters that are not options of the question are ignored.
+    """
+    mask = 0
+    for i, letter in enumerate(letters):
+        if letter in chosen:
+            mask |= 1 << i
+    return mask
+
+
+def grade_mask(answer_mask, selected_mask):
+    """Grades one response given as bitmasks."""
+    return Grade(answer_mask == selected_mask,
+                 _popcount(answer_mask & selected_mask),
+                 _popcount(answer_mask & ~selected_mask),
+                 _popcount(selected_mask & ~answer_mask))
+
+
+def grade(bank, gid, selected):
+    """Grades the option letters `selected` for question `gid` of `bank`."""
+    return grade_mask(bank.answer_mask(gid), option_mask(bank.option_letters(gid), selected))
+
+
+def grade_many(bank, responses):
+    """Grades a batch of {gid: selected letters}; returns {gid: Grade}."""
+    return {gid: grade(bank, gid, selected) for gid, selected in responses.items()}
+
+
+def summarize(grades):
+    """Totals a collection of Grades into one Grade (correct = number fully correct)."""
+    correct = hits = misses = false_picks = 0
+    for g in grades:
+        correct += g.correct
+        hits += g.hits
+        misses += g.misses
+        false_picks += g.false_picks
+    return Grade(correct, hits, misses, false_picks)
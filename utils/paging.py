@@ -0,0 +1,71 @@
+import os
+
+import streamlit as st
+
+# Default number of questions per page, e.g. STUDY_PAGE_SIZE=50
+PAGE_SIZE_ENV = "STUDY_PAGE_SIZE"
+DEFAULT_PAGE_SIZE = 20
+PAGE_SIZES = (10, 20, 50, 100)
+
+
+def default_page_size():
+    try:
+        size = int(os.environ.get(PAGE_SIZE_ENV, DEFAULT_PAGE_SIZE))
+    except ValueError:
+        return DEFAULT_PAGE_SIZE
+    return size if size > 0 else DEFAULT_PAGE_SIZE
+
+
+def num_pages(total, page_size):
+    return max(1, -(-total // page_size))
+
+
+def page_of(position, page_size):
+    """Returns the 1-based page that shows the 0-based `position`."""
+    return position // page_size + 1
+
+
+def page_bounds(total, page, page_size):
+    """Returns the (start, end) slice of `page`, clamped to the list."""
+    page = min(max(page, 1), num_pages(total, page_size))
+    start = (page - 1) * page_size
+    return start, min(start + page_size, total)
+
+
+def render_pager(total, key):
+    """Renders page-size, page and jump-to-question controls.
+
+    Returns the (start, end) slice of the `total` items that should be
+    rendered, so callers only emit elements for the visible page. All
+    widget state lives under `key`-prefixed session keys.
+    """
+    if total <= 0:
+        return 0, 0
+
+    size_key, page_key, jump_key = f"{key}_page_size", f"{key}_page", f"{key}_jump"
+    sizes = sorted(set(PAGE_SIZES) | {default_page_size()})
+    if st.session_state.get(size_key) not in sizes:
+        st.session_state[size_key] = default_page_size()
+
+    def _resize():
+        st.session_state[page_key] = 1
+
+    def _jump():
+        st.session_state[page_key] = page_of(st.session_state[jump_key] - 1, st.session_state[size_key])
+
+    size_col, page_col, jump_col = st.columns(3)
+    size_col.selectbox("Questions per page", sizes, key=size_key, on_change=_resize)
+    page_size = st.session_state[size_key]
+    pages = num_pages(total, page_size)
+
+    # Clamp before the widget is created (the list may have shrunk)
+    st.session_state[page_key] = min(max(int(st.session_state.get(page_key, 1)), 1), pages)
+    page_col.number_input(f"Page (of {pages})", min_value=1, max_value=pages, step=1, key=page_key)
+    if jump_key in st.session_state and not 1 <= st.session_state[jump_key] <= total:
+        del st.session_state[jump_key]
+    jump_col.number_input("Jump to question", min_value=1, max_value=total, step=1,
+                          key=jump_key, on_change=_jump)
+
+    start, end = page_bounds(total, st.session_state[page_key], page_size)
+    st.caption(f"Showing {start + 1}–{end} of {total}")
+    return start, end
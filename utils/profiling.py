@@ -0,0 +1,175 @@
+import functools
+import os
+import threading
+import time
+from collections import defaultdict
+from contextlib import nullcontext
+from contextvars import ContextVar
+
+# Opt-in: STUDY_PROFILE=1. When it is off, timed() returns the function
+# unchanged and phase()/add_bytes() do nothing.
+PROFILE_ENV = "STUDY_PROFILE"
+METRICS_FILE_ENV = "STUDY_METRICS_FILE"
+DEFAULT_METRICS_FILE = "data/metrics.prom"
+EXPORT_INTERVAL = 5.0
+
+ENABLED = os.environ.get(PROFILE_ENV, "").lower() not in ("", "0", "false", "no")
+
+_lock = threading.Lock()
+_calls = defaultdict(lambda: [0, 0.0])  # name -> [count, seconds]
+# read/written: by script runs, when they read or make a change (a queued
+# write counts the document as it leaves it); flushed: what the writer and
+# flush threads actually put on disk, after coalescing (process totals only)
+_bytes = {"read": 0, "written": 0, "flushed": 0}
+_reruns = [0, 0.0]
+_gauges = {}
+_last_export = [0.0]
+_current = ContextVar("profile_rerun", default=None)
+
+
+class RerunProfile:
+    """Calls, time and bytes recorded during one script run."""
+
+    def __init__(self):
+        self.calls = defaultdict(lambda: [0, 0.0])
+        self.bytes = {"read": 0, "written": 0, "flushed": 0}
+        self.started = time.perf_counter()
+        self.elapsed = None
+
+
+def _record(name, seconds):
+    with _lock:
+        total = _calls[name]
+        total[0] += 1
+        total[1] += seconds
+    rerun = _current.get()
+    if rerun is not None:
+        entry = rerun.calls[name]
+        entry[0] += 1
+        entry[1] += seconds
+
+
+def timed(name=None):
+    """Decorator counting and timing calls under `name` (default: the function name)."""
+    def decorator(fn):
+        if not ENABLED:
+            return fn
+        label = name or fn.__name__
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                _record(label, time.perf_counter() - start)
+        return wrapper
+    return decorator
+
+
+class _Phase:
+    __slots__ = ("name", "start")
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        _record(self.name, time.perf_counter() - self.start)
+        return False
+
+
+def phase(name):
+    """Context manager timing a block, e.g. `with phase("flashcards.grade"):`."""
+    return _Phase(name) if ENABLED else nullcontext()
+
+
+def add_bytes(direction, amount):
+    """Records `amount` bytes "read", "written" or "flushed" (see _bytes)."""
+    if not ENABLED:
+        return
+    with _lock:
+        _bytes[direction] += amount
+    rerun = _current.get()
+    if rerun is not None:
+        rerun.bytes[direction] += amount
+
+
+def set_gauge(name, value):
+    """Records the latest value of a gauge such as a queue depth."""
+    if ENABLED:
+        _gauges[name] = value
+
+
+def start_rerun():
+    if not ENABLED:
+        return None
+    profile = RerunProfile()
+    _current.set(profile)
+    return profile
+
+
+def finish_rerun():
+    """Closes the current run's profile, exports the totals if due, and returns the profile."""
+    profile = _current.get()
+    if profile is None:
+        return None
+    profile.elapsed = time.perf_counter() - profile.started
+    _current.set(None)
+    with _lock:
+        _reruns[0] += 1
+        _reruns[1] += profile.elapsed
+        due = time.monotonic() - _last_export[0] >= EXPORT_INTERVAL
+        if due:
+            _last_export[0] = time.monotonic()
+    if due:
+        export_metrics()
+    return profile
+
+
+def format_rerun(profile):
+    """Plain-text table of one run's profile, slowest calls first."""
+    lines = [f"rerun: {profile.elapsed * 1000:.1f} ms, "
+             f"read {profile.bytes['read']} B, written {profile.bytes['written']} B"]
+    for name, (count, seconds) in sorted(profile.calls.items(), key=lambda kv: -kv[1][1]):
+        lines.append(f"{name:<32} {count:>5}x {seconds * 1000:>9.2f} ms")
+    return "\n".join(lines)
+
+
+def prometheus_text():
+    """Returns the process-wide totals in the Prometheus text exposition format."""
+    with _lock:
+        calls = {name: tuple(v) for name, v in _calls.items()}
+        io_bytes = dict(_bytes)
+        reruns, rerun_seconds = _reruns
+        gauges = dict(_gauges)
+    lines = ["# TYPE study_calls_total counter"]
+    lines += [f'study_calls_total{{name="{name}"}} {count}' for name, (count, _) in sorted(calls.items())]
+    lines.append("# TYPE study_call_seconds_total counter")
+    lines += [f'study_call_seconds_total{{name="{name}"}} {seconds:.6f}'
+              for name, (_, seconds) in sorted(calls.items())]
+    lines.append("# TYPE study_io_bytes_total counter")
+    lines += [f'study_io_bytes_total{{direction="{direction}"}} {amount}'
+              for direction, amount in io_bytes.items()]
+    lines.append("# TYPE study_reruns_total counter")
+    lines.append(f"study_reruns_total {reruns}")
+    lines.append("# TYPE study_rerun_seconds_total counter")
+    lines.append(f"study_rerun_seconds_total {rerun_seconds:.6f}")
+    for name, value in sorted(gauges.items()):
+        lines.append(f"# TYPE study_{name} gauge")
+        lines.append(f"study_{name} {value}")
+    return "\n".join(lines) + "\n"
+
+
+def export_metrics(path=None):
+    """Writes prometheus_text() to STUDY_METRICS_FILE (for a node-exporter textfile collector)."""
+    from utils.store import atomic_write_bytes
+
+    path = path or os.environ.get(METRICS_FILE_ENV, DEFAULT_METRICS_FILE)
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    atomic_write_bytes(path, prometheus_text().encode("utf-8"))
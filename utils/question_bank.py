@@ -0,0 +1,517 @@
+import array
+import hashlib
+import json
+import math
+import os
+import re
+import threading
+import time
+from bisect import bisect_right
+from collections import OrderedDict
+from types import MappingProxyType
+
+from utils.bank_format import COMPILED_SUFFIX, CompiledQuestions, compiled_path, source_digest
+from utils.bank_loader import LazyQuestions, should_stream
+from utils.cards import build_card
+from utils.grading import option_mask
+from utils import profiling
+from utils.profiling import timed
+
+QUESTIONS_PER_DAY = 40
+MAX_SELECTIONS = 256
+# Cards and answer masks a lazily loaded or compiled bank keeps (in-memory
+# banks keep them for every question)
+MAX_CACHED_CARDS = 1024
+# Near-duplicate map written by `python -m utils.dedup --aliases`
+ALIASES_SUFFIX = ".aliases.json"
+# How many banks a process keeps loaded, e.g. STUDY_MAX_BANKS=8; the least
+# recently used one is dropped when another bank is loaded
+MAX_BANKS_ENV = "STUDY_MAX_BANKS"
+DEFAULT_MAX_BANKS = 4
+# A loaded bank's files are checked for changes at most this often (seconds)
+RECHECK_INTERVAL = 1.0
+
+# Day layout overrides, e.g. STUDY_DAY_SIZES="40,40,50" (the last size is
+# repeated for the rest of the bank) or STUDY_DAY_WEIGHTS="1,1,2,2" (the
+# bank is split proportionally into that many days).
+DAY_SIZES_ENV = "STUDY_DAY_SIZES"
+DAY_WEIGHTS_ENV = "STUDY_DAY_WEIGHTS"
+
+# A mistake key from before mistakes were keyed by gid ("day3_q17")
+_LEGACY_KEY_RE = re.compile(r"day([1-9][0-9]*)_q(0|[1-9][0-9]*)")
+
+_banks = OrderedDict()  # abspath -> (signature, bank), least recently used first
+_banks_lock = threading.Lock()
+_load_locks = {}  # abspath -> lock held while that bank is parsed
+_bank_stats = {}  # abspath -> {"hits", "misses", "evictions"}
+_eviction_callbacks = []
+_checked = {}  # path as requested -> (time of the last check, abspath, bank)
+
+
+def _freeze_question(q):
+    """Returns a read-only copy of a question dict."""
+    return MappingProxyType({
+        "question": q.get("question", ""),
+        "instruction": q.get("instruction", ""),
+        "options": MappingProxyType(dict(q.get("options", {}))),
+        "answers": tuple(q.get("answers", [])),
+    })
+
+
+def _env_numbers(name, kind):
+    """The comma-separated numbers in environment variable `name`; None if unset or malformed."""
+    value = os.environ.get(name)
+    if not value:
+        return None
+    try:
+        return [kind(v) for v in value.split(",")]
+    except ValueError:
+        return None
+
+
+class DayPartition:
+    """Precomputed split of a bank into consecutive study days.
+
+    Saved mistakes are keyed by gid, so changing the layout only changes
+    which day shows them.
+    """
+
+    def __init__(self, sizes):
+        self.sizes = tuple(sizes)
+        starts = [0]
+        for size in self.sizes:
+            starts.append(starts[-1] + size)
+        self._starts = tuple(starts)
+
+    @classmethod
+    def from_sizes(cls, total, sizes):
+        """Uses `sizes` for the first days and repeats the last size until `total` is covered."""
+        sizes = [s for s in sizes if s > 0] or [QUESTIONS_PER_DAY]
+        layout = []
+        remaining = total
+        for i in range(total):
+            if remaining <= 0:
+                break
+            size = min(sizes[min(i, len(sizes) - 1)], remaining)
+            layout.append(size)
+            remaining -= size
+        return cls(layout)
+
+    @classmethod
+    def weighted(cls, total, weights):
+        """Splits `total` questions into len(weights) days proportional to `weights`."""
+        weight_sum = float(sum(weights))
+        exact = [total * w / weight_sum for w in weights]
+        layout = [int(x) for x in exact]
+        # Hand the leftover questions to the largest remainders
+        by_remainder = sorted(range(len(weights)), key=lambda i: exact[i] - layout[i], reverse=True)
+        for i in by_remainder[:total - sum(layout)]:
+            layout[i] += 1
+        return cls(layout)
+
+    @classmethod
+    def from_env(cls, total, questions_per_day=QUESTIONS_PER_DAY):
+        """The layout set by STUDY_DAY_WEIGHTS or STUDY_DAY_SIZES; invalid values are ignored."""
+        weights = _env_numbers(DAY_WEIGHTS_ENV, float)
+        if weights and all(0 < w < math.inf for w in weights):
+            return cls.weighted(total, weights)
+        sizes = _env_numbers(DAY_SIZES_ENV, int)
+        if sizes and all(s > 0 for s in sizes):
+            return cls.from_sizes(total, sizes)
+        return cls.from_sizes(total, [questions_per_day])
+
+    @property
+    def num_days(self):
+        return len(self.sizes)
+
+    @property
+    def total(self):
+        return self._starts[-1]
+
+    def day_range(self, day):
+        """Returns the (start, end) gids of `day`; empty for unknown days."""
+        if not 1 <= day <= len(self.sizes):
+            return 0, 0
+        return self._starts[day - 1], self._starts[day]
+
+    def day_size(self, day):
+        start, end = self.day_range(day)
+        return end - start
+
+    def locate(self, gid):
+        """Returns the (day, qidx) of a global index, by binary search over the day starts."""
+        if not 0 <= gid < self.total:
+            raise IndexError("question index out of range")
+        day = bisect_right(self._starts, gid)
+        return day, gid - self._starts[day - 1]
+
+    def gid(self, day, qidx):
+        """Returns the global index of position `qidx` of `day`, or None."""
+        start, end = self.day_range(day)
+        return start + qidx if 0 <= qidx < end - start else None
+
+
+def legacy_key_gid(key):
+    """The gid a legacy mistake key ("day3_q17", QUESTIONS_PER_DAY a day) named, or None."""
+    match = _LEGACY_KEY_RE.fullmatch(key)
+    if match is None or int(match.group(2)) >= QUESTIONS_PER_DAY:
+        return None
+    return (int(match.group(1)) - 1) * QUESTIONS_PER_DAY + int(match.group(2))
+
+
+class QuestionBank:
+    """Immutable, indexed question bank shared by every session in the process.
+
+    Questions are identified by their global index (`gid`), which also
+    keys saved mistakes; (day, qidx) pairs are translated to and from
+    gids in O(log days) through the day partition. In-memory banks build
+    every card and answer mask when they load; lazily loaded and compiled
+    banks build them on first use and keep the MAX_CACHED_CARDS most
+    recently used.
+    """
+
+    def __init__(self, questions, path=None, digest=None, partition=None):
+        if isinstance(questions, (LazyQuestions, CompiledQuestions)):
+            # Large or compiled banks: questions are decoded on first access
+            self._questions = questions
+        else:
+            self._questions = tuple(_freeze_question(q) for q in questions)
+        self.path = path
+        self.digest = digest
+        self.partition = partition or DayPartition.from_env(len(self._questions))
+
+        # gid -> answer bitmask over its options / pre-rendered Card; a new
+        # bank (new digest) starts new caches
+        self._bounded = not isinstance(self._questions, tuple)
+        self._answer_masks = OrderedDict() if self._bounded else {}
+        self._cards = OrderedDict() if self._bounded else {}
+        self._cache_lock = threading.Lock()
+        self._selections = {}
+        self._aliases = {}  # duplicate gid -> canonical gid
+        self._alias_days = {}  # day -> other days with duplicates of its questions
+        self._duplicate_days = set()  # days with duplicates of other days' questions
+        self._search_index = None
+        self._search_lock = threading.Lock()
+        if not self._bounded:
+            for gid in range(len(self._questions)):
+                self.answer_mask(gid)
+                self.card(gid)
+
+    def __len__(self):
+        return len(self._questions)
+
+    def __iter__(self):
+        return iter(self._questions)
+
+    def __getitem__(self, item):
+        return self._questions[item]
+
+    def get(self, day, qidx):
+        """Returns the question at position `qidx` of `day`, or None."""
+        gid = self.partition.gid(day, qidx)
+        return None if gid is None else self._questions[gid]
+
+    def gid(self, day, qidx):
+        """Returns the global index of position `qidx` of `day`, or None."""
+        return self.partition.gid(day, qidx)
+
+    def locate(self, gid):
+        """Returns the (day, qidx) of a global index."""
+        return self.partition.locate(gid)
+
+    def label(self, gid):
+        """Returns the day position of a global index for display ("day3_q17")."""
+        return "day%d_q%d" % self.partition.locate(gid)
+
+    def canonical(self, gid):
+        """The gid mistakes on `gid` count for: its canonical question if it is a near-duplicate."""
+        return self._aliases.get(gid, gid)
+
+    def mistakes_by_gid(self, mistakes):
+        """Converts saved {gid: count} counters to int gids, dropping gids not in the bank.
+
+        Counts logged against near-duplicates are added to the canonical question.
+        """
+        by_gid = {}
+        total = len(self._questions)
+        for key, count in mistakes.items():
+            gid = int(key) if key.isdigit() else -1
+            if 0 <= gid < total:
+                gid = self._aliases.get(gid, gid)
+                by_gid[gid] = by_gid.get(gid, 0) + count
+        return by_gid
+
+    def set_aliases(self, aliases):
+        """Installs a {duplicate gid: canonical gid} map (see utils.dedup)."""
+        total = len(self._questions)
+        self._aliases = {dup: canonical for dup, canonical in aliases.items()
+                         if 0 <= dup < total and 0 <= canonical < total}
+        self._alias_days = {}
+        self._duplicate_days = set()
+        for dup, canonical in self._aliases.items():
+            dup_day, canonical_day = self.locate(dup)[0], self.locate(canonical)[0]
+            if dup_day != canonical_day:
+                self._alias_days.setdefault(canonical_day, set()).add(dup_day)
+                self._duplicate_days.add(dup_day)
+
+    def alias_days(self, day):
+        """`day` and the days holding near-duplicates of its questions, ascending.
+
+        Mistakes logged under a duplicate count for the canonical question,
+        so a day's mistakes have to be read from all of these days.
+        """
+        return sorted({day} | self._alias_days.get(day, set()))
+
+    def own_mistakes_only(self, day):
+        """Whether `day` shows exactly the mistakes logged on its own questions.
+
+        False if near-duplicates link it to another day in either direction.
+        """
+        return day not in self._alias_days and day not in self._duplicate_days
+
+    def option_letters(self, gid):
+        return tuple(self._questions[gid]["options"])
+
+    def _cached(self, cache, gid):
+        value = cache.get(gid)
+        if value is not None and self._bounded:
+            with self._cache_lock:
+                if gid in cache:
+                    cache.move_to_end(gid)
+        return value
+
+    def _remember(self, cache, gid, value):
+        if not self._bounded:
+            cache[gid] = value
+            return value
+        with self._cache_lock:
+            cache[gid] = value
+            while len(cache) > MAX_CACHED_CARDS:
+                cache.popitem(last=False)
+        return value
+
+    def answer_mask(self, gid):
+        """Returns the correct options of `gid` as a bitmask (see utils.grading)."""
+        mask = self._cached(self._answer_masks, gid)
+        if mask is None:
+            q = self._questions[gid]
+            mask = getattr(q, "answer_mask", None)
+            if mask is None:
+                mask = option_mask(tuple(q["options"]), q["answers"])
+            self._remember(self._answer_masks, gid, mask)
+        return mask
+
+    def answer_letters(self, gid):
+        """Returns the correct option letters of `gid`, sorted for display."""
+        mask = self.answer_mask(gid)
+        return sorted(k for i, k in enumerate(self.option_letters(gid)) if mask >> i & 1)
+
+    def card(self, gid):
+        """Returns the display strings of `gid` (see utils.cards), built on first use."""
+        card = self._cached(self._cards, gid)
+        if card is None:
+            card = self._remember(self._cards, gid, build_card(self._questions[gid], self.answer_letters(gid)))
+        return card
+
+    def search_index(self):
+        """Returns the bank's full-text index (see utils.search), built on first use."""
+        if self._search_index is None:
+            with self._search_lock:
+                if self._search_index is None:
+                    from utils.search import SearchIndex
+                    self._search_index = SearchIndex(self)
+        return self._search_index
+
+    def day_questions(self, day):
+        start, end = self.partition.day_range(day)
+        return self._questions[start:end]
+
+    def day_gids(self, day):
+        return range(*self.partition.day_range(day))
+
+    def gids_for_days(self, days):
+        """Returns the gids of `days` in ascending day order, cached per day set."""
+        key = tuple(sorted(set(days)))
+        gids = self._selections.get(key)
+        if gids is None:
+            gids = array.array("l", (gid for day in key for gid in self.day_gids(day)))
+            if len(self._selections) >= MAX_SELECTIONS:
+                self._selections.clear()
+            self._selections[key] = gids
+        return gids
+
+    @property
+    def num_days(self):
+        return self.partition.num_days
+
+    @property
+    def days(self):
+        return list(range(1, self.partition.num_days + 1))
+
+
+def _file_signature(path):
+    st = os.stat(path)
+    return st.st_mtime_ns, st.st_size
+
+
+def _file_digest(path):
+    sha = hashlib.sha1()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            sha.update(chunk)
+    return sha.hexdigest()
+
+
+def aliases_path(path):
+    """questions.json -> questions.aliases.json"""
+    return os.path.splitext(path)[0] + ALIASES_SUFFIX
+
+
+def _alias_gid(key):
+    """An alias map key as a gid; maps written before gids were used have legacy keys."""
+    return int(key) if key.isdigit() else legacy_key_gid(key)
+
+
+def _load_aliases(path, digest):
+    """The {duplicate gid: canonical gid} map next to `path`, if it was built from this exact content."""
+    try:
+        with open(aliases_path(path), "r", encoding="utf-8") as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    if data.get("source_digest") != digest:
+        return {}
+    aliases = {}
+    for dup, canonical in data.get("aliases", {}).items():
+        dup = _alias_gid(dup)
+        canonical = canonical if isinstance(canonical, int) else _alias_gid(canonical)
+        if dup is not None and canonical is not None:
+            aliases[dup] = canonical
+    return aliases
+
+
+def _has_fresh_compiled(path, digest):
+    """Whether the .qbank next to `path` was compiled from this exact content."""
+    target = compiled_path(path)
+    return os.path.exists(target) and source_digest(target) == digest
+
+
+def max_banks():
+    try:
+        return max(1, int(os.environ.get(MAX_BANKS_ENV, DEFAULT_MAX_BANKS)))
+    except ValueError:
+        return DEFAULT_MAX_BANKS
+
+
+def _count(key, stat):
+    stats = _bank_stats.get(key)
+    if stats is None:
+        stats = _bank_stats[key] = {"hits": 0, "misses": 0, "evictions": 0}
+    stats[stat] += 1
+
+
+def bank_cache_stats():
+    """{bank path: {"hits", "misses", "evictions", "loaded"}} for every bank requested so far."""
+    with _banks_lock:
+        return {os.path.relpath(key): dict(stats, loaded=key in _banks) for key, stats in _bank_stats.items()}
+
+
+def bank_key(bank):
+    """The key that caches of per-bank data use (see on_bank_evicted)."""
+    return os.path.abspath(bank.path) if bank.path else id(bank)
+
+
+def on_bank_evicted(callback):
+    """Registers callback(key) to drop data kept for a bank once it is evicted or replaced."""
+    _eviction_callbacks.append(callback)
+
+
+def _load_bank(path, digest, entry, file_size):
+    compiled_bank = path.endswith(COMPILED_SUFFIX)
+    if entry is not None and entry[1].digest == digest:
+        # Touched but unchanged: keep the existing bank
+        return entry[1]
+    if compiled_bank:
+        return QuestionBank(CompiledQuestions(path), path=path, digest=digest)
+    if _has_fresh_compiled(path, digest):
+        return QuestionBank(CompiledQuestions(compiled_path(path)), path=path, digest=digest)
+    if should_stream(path):
+        return QuestionBank(LazyQuestions(path, freeze=_freeze_question), path=path, digest=digest)
+    with open(path, "r", encoding="utf-8") as f:
+        bank = QuestionBank(json.load(f), path=path, digest=digest)
+    profiling.add_bytes("read", file_size)
+    return bank
+
+
+@timed()
+def get_question_bank(path=None):
+    """Returns the shared bank for `path` (default: the current bank, see utils.bank_registry).
+
+    Banks load on first use and reload only if the file changed (checked
+    at most every RECHECK_INTERVAL seconds); at most max_banks() stay
+    loaded, the least recently used is evicted first.
+    A bank is parsed under its own load lock, so loading one bank does
+    not hold up requests for the others.
+    """
+    if path is None:
+        from utils.bank_registry import bank_path
+        path = bank_path()
+    checked = _checked.get(path)
+    if checked is not None and time.monotonic() - checked[0] < RECHECK_INTERVAL:
+        # Checked a moment ago: skip the stat calls while it is still loaded
+        with _banks_lock:
+            entry = _banks.get(checked[1])
+            if entry is not None and entry[1] is checked[2]:
+                _banks.move_to_end(checked[1])
+                _count(checked[1], "hits")
+                return entry[1]
+    bank = _get_question_bank(path)
+    _checked[path] = (time.monotonic(), os.path.abspath(path), bank)
+    return bank
+
+
+def _get_question_bank(path):
+    key = os.path.abspath(path)
+    alias_file = aliases_path(path)
+    signature = (_file_signature(path),
+                 _file_signature(alias_file) if os.path.exists(alias_file) else None)
+
+    def cached():
+        entry = _banks.get(key)
+        if entry is not None and entry[0] == signature:
+            _banks.move_to_end(key)
+            _count(key, "hits")
+            return entry
+        return None
+
+    with _banks_lock:
+        entry = cached()
+        if entry is not None:
+            return entry[1]
+        load_lock = _load_locks.setdefault(key, threading.Lock())
+
+    with load_lock:
+        with _banks_lock:
+            # Someone else may have loaded it while we waited
+            entry = cached()
+            if entry is not None:
+                return entry[1]
+            entry = _banks.get(key)
+        digest = source_digest(path) if path.endswith(COMPILED_SUFFIX) else _file_digest(path)
+        bank = _load_bank(path, digest, entry, signature[0][1])
+        bank.set_aliases(_load_aliases(path, digest))
+        dropped = [] if entry is None or entry[1] is bank else [key]
+        with _banks_lock:
+            _count(key, "misses")
+            _banks[key] = (signature, bank)
+            _banks.move_to_end(key)
+            while len(_banks) > max_banks():
+                evicted, _ = _banks.popitem(last=False)
+                _count(evicted, "evictions")
+                dropped.append(evicted)
+    for evicted in dropped:
+        for requested in [p for p, checked in list(_checked.items()) if checked[1] == evicted]:
+            _checked.pop(requested, None)
+        for callback in _eviction_callbacks:
+            callback(evicted)
+    return bank
@@ -0,0 +1,138 @@
+import random
+import threading
+from collections import OrderedDict
+
+from utils.analytics import get_analytics
+from utils.question_bank import bank_key, on_bank_evicted
+from utils.users import shard_path
+
+# Smoothed error rate (errors + 1) / (attempts + 2): unseen questions weigh
+# 0.5, always-missed ones approach 1, always-right ones approach 0.
+PRIOR_ERRORS = 1
+PRIOR_ATTEMPTS = 2
+MAX_SAMPLERS = 64
+MAX_TRIES_PER_DRAW = 8
+
+_samplers = OrderedDict()
+_samplers_lock = threading.Lock()
+
+
+class AliasTable:
+    """Vose's alias method: O(n) to build, O(1) per weighted draw."""
+
+    __slots__ = ("n", "prob", "alias")
+
+    def __init__(self, weights):
+        n = self.n = len(weights)
+        total = sum(weights)
+        scaled = [w * n / total for w in weights] if total > 0 else [1.0] * n
+        self.prob = [1.0] * n
+        self.alias = list(range(n))
+        small = [i for i, p in enumerate(scaled) if p < 1.0]
+        large = [i for i, p in enumerate(scaled) if p >= 1.0]
+        while small and large:
+            s, l = small.pop(), large.pop()
+            self.prob[s] = scaled[s]
+            self.alias[s] = l
+            scaled[l] += scaled[s] - 1.0
+            (small if scaled[l] < 1.0 else large).append(l)
+
+    def draw(self, rng):
+        i = rng.randrange(self.n)
+        return i if rng.random() < self.prob[i] else self.alias[i]
+
+
+def stratify(sizes, k):
+    """Splits `k` draws over strata proportionally to `sizes` (largest remainder)."""
+    total = sum(sizes)
+    k = min(k, total)
+    if not total:
+        return [0] * len(sizes)
+    exact = [k * size / total for size in sizes]
+    quotas = [int(x) for x in exact]
+    by_remainder = sorted(range(len(sizes)), key=lambda i: quotas[i] - exact[i])
+    for i in by_remainder[:k - sum(quotas)]:
+        quotas[i] += 1
+    return quotas
+
+
+class QuizSampler:
+    """Per-day alias tables over the learner's smoothed error rates.
+
+    A day's table is rebuilt only when the analytics engine saw new
+    attempts for that day (its day_versions entry changed).
+    """
+
+    def __init__(self, bank, analytics):
+        self.bank = bank
+        self.analytics = analytics
+        self._tables = {}  # day -> (version, AliasTable)
+        self._lock = threading.Lock()
+
+    def table(self, day):
+        version = int(self.analytics.day_versions[day])
+        entry = self._tables.get(day)
+        if entry is None or entry[0] != version:
+            start, end = self.bank.partition.day_range(day)
+            errors = self.analytics.errors[start:end] + PRIOR_ERRORS
+            attempts = self.analytics.attempts[start:end] + PRIOR_ATTEMPTS
+            entry = self._tables[day] = (version, AliasTable((errors / attempts).tolist()))
+        return entry[1]
+
+    def draw(self, days, k, rng=None):
+        """Draws `k` distinct gids from `days`, stratified by day size, most-missed most likely."""
+        rng = rng or random.Random()
+        days = sorted(set(days))
+        sizes = [self.bank.partition.day_size(day) for day in days]
+        gids = []
+        with self._lock:
+            for day, size, quota in zip(days, sizes, stratify(sizes, k)):
+                if not quota:
+                    continue
+                start = self.bank.partition.day_range(day)[0]
+                if quota >= size:
+                    gids.extend(range(start, start + size))
+                    continue
+                table = self.table(day)
+                chosen = {}
+                for _ in range(quota * MAX_TRIES_PER_DRAW):
+                    chosen[table.draw(rng)] = None
+                    if len(chosen) == quota:
+                        break
+                if len(chosen) < quota:
+                    # Very skewed weights: fill up uniformly from the rest
+                    rest = [i for i in range(size) if i not in chosen]
+                    chosen.update(dict.fromkeys(rng.sample(rest, quota - len(chosen))))
+                gids.extend(start + i for i in chosen)
+        rng.shuffle(gids)
+        return gids
+
+
+def get_quiz_sampler(bank):
+    """Returns the current user's sampler for `bank`, with the attempt history brought up to date."""
+    analytics = get_analytics(bank)
+    key = (bank_key(bank), shard_path(analytics.path))
+    with _samplers_lock:
+        sampler = _samplers.get(key)
+        if sampler is None or sampler.analytics is not analytics:
+            sampler = _samplers[key] = QuizSampler(bank, analytics)
+            while len(_samplers) > MAX_SAMPLERS:
+                _samplers.popitem(last=False)
+        else:
+            _samplers.move_to_end(key)
+    return sampler
+
+
+def build_quiz(bank, days, k, seed=None):
+    """Returns `k` question gids drawn from `days` for an adaptive quiz."""
+    return get_quiz_sampler(bank).draw(days, k, random.Random(seed))
+
+
+def _drop_bank(key):
+    """Forgets every user's sampler of an evicted bank, so the bank can be freed."""
+    with _samplers_lock:
+        for sampler_key in [k for k in _samplers if k[0] == key]:
+            del _samplers[sampler_key]
+
+
+on_bank_evicted(_drop_bank)
@@ -0,0 +1,78 @@
+import hashlib
+import random
+
+# A study round is a small dict instead of a shuffled list of positions:
+#   {"seed", "n", "bank", "due", "k", "index"}
+# Positions 0..n-1 are visited as the (at most MAX_DUE) due positions first,
+# then in the order of a seeded bijection on [0, n), skipping those. "k" is
+# the next input of the bijection and "index" the number of cards done, so
+# saving a round costs the same few bytes however large the selection is.
+MAX_DUE = 64
+FEISTEL_ROUNDS = 4
+
+
+def _feistel(x, half_bits, seed):
+    mask = (1 << half_bits) - 1
+    left, right = x >> half_bits, x & mask
+    for r in range(FEISTEL_ROUNDS):
+        digest = hashlib.blake2b(f"{seed}:{r}:{right}".encode(), digest_size=8).digest()
+        left, right = right, left ^ (int.from_bytes(digest, "little") & mask)
+    return (left << half_bits) | right
+
+
+def permute(i, n, seed):
+    """The `i`-th element of a seeded permutation of range(n) (a Feistel network with cycle walking)."""
+    half_bits = max(1, ((n - 1).bit_length() + 1) // 2)
+    x = _feistel(i, half_bits, seed)
+    while x >= n:
+        x = _feistel(x, half_bits, seed)
+    return x
+
+
+def new_round(n, bank_digest, due=(), seed=None):
+    """A round over positions 0..n-1 of the current selection of `bank_digest`."""
+    return {
+        "seed": random.getrandbits(63) if seed is None else seed,
+        "n": n,
+        "bank": (bank_digest or "")[:12],
+        "due": list(due)[:MAX_DUE],
+        "k": 0,
+        "index": 0,
+    }
+
+
+def is_current(saved, n, bank_digest):
+    """Whether a saved round still matches the selection (same size, same bank version)."""
+    return (isinstance(saved, dict) and "seed" in saved and saved.get("n") == n
+            and saved.get("bank") == (bank_digest or "")[:12])
+
+
+def finished(rnd):
+    return rnd["index"] >= rnd["n"]
+
+
+def _next_k(rnd, k):
+    """The first bijection input >= k whose position is not in the due prefix."""
+    due = rnd["due"]
+    while due and k < rnd["n"] and permute(k, rnd["n"], rnd["seed"]) in due:
+        k += 1
+    return k
+
+
+def position(rnd):
+    """The position of the current card, or None when the round is finished."""
+    if finished(rnd):
+        return None
+    due = rnd["due"]
+    if rnd["index"] < len(due):
+        return due[rnd["index"]]
+    return permute(_next_k(rnd, rnd["k"]), rnd["n"], rnd["seed"])
+
+
+def advance(rnd):
+    """Returns the round moved on to the next card (the given dict is not changed)."""
+    rnd = dict(rnd)
+    if rnd["index"] >= len(rnd["due"]):
+        rnd["k"] = _next_k(rnd, _next_k(rnd, rnd["k"]) + 1)
+    rnd["index"] += 1
+    return rnd
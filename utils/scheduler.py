@@ -0,0 +1,131 @@
+import heapq
+import random
+import time
+
+from utils.utils import load_json, set_json_value
+from utils.users import get_current_bank
+
+# Shared by every mode, keyed by global question id
+SRS_FILE = "day_practice/data/srs_state.json"
+
+DAY = 24 * 60 * 60
+RELEARN_DELAY = 10 * 60
+DEFAULT_EASE = 2.5
+MIN_EASE = 1.3
+# Stale heap entries tolerated before the due queue is rebuilt
+STALE_SLACK = 64
+
+
+class CardState:
+    """SM-2 scheduling state of one question."""
+
+    __slots__ = ("ease", "interval", "reps", "due")
+
+    def __init__(self, ease=DEFAULT_EASE, interval=0.0, reps=0, due=0.0):
+        self.ease = ease
+        self.interval = interval
+        self.reps = reps
+        self.due = due
+
+    def to_list(self):
+        return [round(self.ease, 3), self.interval, self.reps, int(self.due)]
+
+    @classmethod
+    def from_list(cls, values):
+        return cls(*values)
+
+
+def review_card(state, correct, now):
+    """Applies one SM-2 review (grade 4 if correct, 1 if not) and returns the new state."""
+    quality = 4 if correct else 1
+    ease = max(MIN_EASE, state.ease + 0.1 - (5 - quality) * (0.08 + (5 - quality) * 0.02))
+    if not correct:
+        return CardState(ease, 0.0, 0, now + RELEARN_DELAY)
+    reps = state.reps + 1
+    if reps == 1:
+        interval = 1.0
+    elif reps == 2:
+        interval = 6.0
+    else:
+        interval = round(state.interval * ease, 1)
+    return CardState(ease, interval, reps, now + interval * DAY)
+
+
+class Scheduler:
+    """Per-user spaced-repetition scheduler with a heap-ordered due queue.
+
+    The heap holds (due, gid) entries. Rescheduling pushes a new entry;
+    stale ones are dropped when they surface, and the heap is rebuilt
+    once they outnumber the live ones, so review() is amortized
+    O(log n). Due cards are served off the heap in O(k log n) for the
+    k cards looked at, without scanning or sorting the whole selection.
+    """
+
+    def __init__(self, states=None):
+        self.states = states or {}
+        self._rebuild()
+
+    def _rebuild(self):
+        self._heap = [(s.due, gid) for gid, s in self.states.items()]
+        heapq.heapify(self._heap)
+
+    @classmethod
+    def load(cls, path=SRS_FILE):
+        raw = load_json(path, {})
+        return cls({int(gid): CardState.from_list(v) for gid, v in raw.items()})
+
+    def review(self, gid, correct, now=None, path=SRS_FILE):
+        """Records an answer, reschedules the card and persists its state."""
+        now = time.time() if now is None else now
+        state = review_card(self.states.get(gid, CardState()), correct, now)
+        self.states[gid] = state
+        heapq.heappush(self._heap, (state.due, gid))
+        if len(self._heap) > 2 * len(self.states) + STALE_SLACK:
+            self._rebuild()
+        if path is not None:
+            set_json_value(path, str(gid), state.to_list())
+        return state
+
+    def due_order(self, gids, now=None, limit=None):
+        """The due cards among `gids` (any container), most overdue first.
+
+        Due entries are popped off the heap (stale ones for good) and the
+        live ones pushed back; it stops after `limit` matches.
+        """
+        now = time.time() if now is None else now
+        live, due = [], []
+        while self._heap and self._heap[0][0] <= now and (limit is None or len(due) < limit):
+            entry = heapq.heappop(self._heap)
+            due_at, gid = entry
+            if self.states[gid].due != due_at or (live and live[-1] == entry):
+                continue
+            live.append(entry)
+            if gid in gids:
+                due.append(gid)
+        for entry in live:
+            heapq.heappush(self._heap, entry)
+        return due
+
+    def order(self, gids, now=None, priority=None):
+        """Orders `gids` for a study round.
+
+        Due cards come first (most overdue first, off the due queue), then
+        cards never seen, then cards not yet due by due time. `priority`
+        (e.g. miss counts) breaks ties in favour of larger values.
+        """
+        now = time.time() if now is None else now
+        priority = priority or {}
+        selection = set(gids)
+        due = self.due_order(selection, now)
+        rest = sorted(selection.difference(due), key=lambda gid: (
+            (2, self.states[gid].due) if gid in self.states else (1, now),
+            -priority.get(gid, 0), random.random()))
+        return due + rest
+
+
+def session_scheduler(session_state):
+    """Returns the scheduler cached in a Streamlit session, loading it once per bank."""
+    key = f"srs_scheduler:{get_current_bank()}"
+    if key not in session_state:
+        session_state[key] = Scheduler.load()
+    return session_state[key]
@@ -0,0 +1,89 @@
+import heapq
+import math
+import re
+from bisect import bisect_left
+from collections import defaultdict
+
+TOKEN_RE = re.compile(r"[0-9a-z]+")
+# Where a term occurs decides how much it counts
+FIELD_WEIGHTS = {"question": 3.0, "options": 1.0, "instruction": 0.5}
+PREFIX_WEIGHT = 0.7   # a term only matched as a prefix ("net" -> "network")
+MAX_EXPANSIONS = 64   # prefix expansions considered per query token
+MIN_PREFIX_LEN = 2    # shorter query tokens only match exactly
+
+
+def tokenize(text):
+    return TOKEN_RE.findall(text.lower())
+
+
+class SearchIndex:
+    """Inverted index over question, instruction and option text of a bank.
+
+    postings: term -> {gid: field-weighted term frequency * idf}. Query
+    tokens also match longer terms they are a prefix of (through binary
+    search in the sorted vocabulary); every token has to match, and
+    results are ranked by the sum of their scores.
+    """
+
+    def __init__(self, bank):
+        postings = defaultdict(lambda: defaultdict(float))
+        # The raw fields, not bank.card(): a lazily loaded bank would build
+        # (and mostly evict again) a card for every question
+        for gid, q in enumerate(bank):
+            # Option texts without their letters, or every question would
+            # match the single-letter terms a, b, c, d
+            fields = (("question", q.get("question", "")), ("instruction", q.get("instruction", "")),
+                      ("options", " ".join(q.get("options", {}).values())))
+            for field, text in fields:
+                weight = FIELD_WEIGHTS[field]
+                for term in tokenize(text):
+                    postings[term][gid] += weight
+        total = max(len(bank), 1)
+        self._postings = {}
+        for term, by_gid in postings.items():
+            idf = math.log(1 + total / len(by_gid))
+            self._postings[term] = {gid: tf * idf for gid, tf in by_gid.items()}
+        self._terms = sorted(self._postings)
+
+    def __len__(self):
+        return len(self._terms)
+
+    def _expand(self, token):
+        """Vocabulary terms starting with `token` (the exact term first, if present)."""
+        if len(token) < MIN_PREFIX_LEN:
+            return [token] if token in self._postings else []
+        terms = []
+        i = bisect_left(self._terms, token)
+        while i < len(self._terms) and len(terms) < MAX_EXPANSIONS and self._terms[i].startswith(token):
+            terms.append(self._terms[i])
+            i += 1
+        return terms
+
+    def _token_scores(self, token):
+        scores = {}
+        for term in self._expand(token):
+            factor = 1.0 if term == token else PREFIX_WEIGHT
+            for gid, weight in self._postings[term].items():
+                score = weight * factor
+                if score > scores.get(gid, 0.0):
+                    scores[gid] = score
+        return scores
+
+    def search(self, query, limit=None):
+        """Returns the gids matching every token of `query`, best match first."""
+        scores = None
+        for token in dict.fromkeys(tokenize(query)):
+            token_scores = self._token_scores(token)
+            if scores is None:
+                scores = token_scores
+            else:
+                small, large = sorted((scores, token_scores), key=len)
+                scores = {gid: s + large[gid] for gid, s in small.items() if gid in large}
+            if not scores:
+                return []
+        if not scores:
+            return []
+        key = lambda gid: (-scores[gid], gid)
+        if limit is not None:
+            return heapq.nsmallest(limit, scores, key=key)
+        return sorted(scores, key=key)
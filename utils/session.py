@@ -0,0 +1,105 @@
+import functools
+import sys
+from types import FunctionType, MemberDescriptorType, ModuleType
+
+_PREFIX = "mode:"
+
+
+class ModeState:
+    """One mode's session state, kept as a single dict in st.session_state.
+
+    Values are read and written as attributes (`state.index += 1`).
+    Widget keys come from `widget_key()` and carry a generation number:
+    `reset_widgets()` bumps it, so the next run renders fresh widgets and
+    Streamlit drops the old widget state on its own. `clear()` resets the
+    whole mode in O(1), without scanning the session's keys.
+    """
+
+    __slots__ = ("_name", "_data")
+
+    def __init__(self, session_state, name):
+        key = _PREFIX + name
+        if key not in session_state:
+            session_state[key] = {"_gen": 0}
+        object.__setattr__(self, "_name", name)
+        object.__setattr__(self, "_data", session_state[key])
+
+    def __getattr__(self, attr):
+        try:
+            return self._data[attr]
+        except KeyError:
+            raise AttributeError(attr) from None
+
+    def __setattr__(self, attr, value):
+        self._data[attr] = value
+
+    def __contains__(self, attr):
+        return attr in self._data
+
+    def get(self, attr, default=None):
+        return self._data.get(attr, default)
+
+    def widget_key(self, *parts):
+        return f"{self._name}{self._data['_gen']}_" + "_".join(map(str, parts))
+
+    def reset_widgets(self):
+        self._data["_gen"] += 1
+
+    def clear(self):
+        """Forgets every value of this mode and all of its widgets."""
+        gen = self._data["_gen"] + 1
+        self._data.clear()
+        self._data["_gen"] = gen
+
+
+def mode_state(session_state, name):
+    return ModeState(session_state, name)
+
+
+def clear_modes(session_state):
+    """Clears every mode's state, e.g. when the learner switches question banks."""
+    for key in [k for k in session_state.keys() if k.startswith(_PREFIX)]:
+        ModeState(session_state, key[len(_PREFIX):]).clear()
+
+
+@functools.lru_cache(maxsize=None)
+def _slots(cls):
+    """The __slots__ descriptors of `cls` and its bases."""
+    return tuple(d for klass in cls.__mro__ for d in vars(klass).values()
+                 if isinstance(d, MemberDescriptorType))
+
+
+def _deep_sizeof(obj, seen):
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        size += sum(_deep_sizeof(k, seen) + _deep_sizeof(v, seen) for k, v in obj.items())
+    elif isinstance(obj, (list, tuple, set, frozenset)):
+        size += sum(_deep_sizeof(v, seen) for v in obj)
+    elif not isinstance(obj, (str, bytes, int, float, type, ModuleType, FunctionType)):
+        # Plain objects such as the Scheduler (utils.scheduler): their
+        # attributes, in __dict__ or in slots (classes and modules are not walked)
+        attributes = getattr(obj, "__dict__", None)
+        if isinstance(attributes, dict):
+            size += _deep_sizeof(attributes, seen)
+        for slot in _slots(type(obj)):
+            try:
+                size += _deep_sizeof(slot.__get__(obj), seen)
+            except AttributeError:
+                continue
+    return size
+
+
+def session_footprint(session_state):
+    """Returns (number of keys, approximate bytes) held by a session."""
+    seen = set()
+    keys = list(session_state.keys())
+    size = 0
+    for k in keys:
+        try:
+            size += _deep_sizeof(k, seen) + _deep_sizeof(session_state[k], seen)
+        except KeyError:
+            continue
+    return len(keys), size
@@ -0,0 +1,350 @@
+import copy
+import glob
+import json
+import os
+import re
+import sqlite3
+import sys
+import threading
+
+from utils.store import DEFAULT_DB_PATH
+from utils.users import BANKS_DIR, DEFAULT_BANK, DEFAULT_USER, USERS_DIR, state_owner
+
+# day_practice/data/day_mistakes.json -> ("day", "mistakes")
+_FILE_RE = re.compile(r"^(?P<scope>[a-z]+)_(?P<kind>mistakes|progress|answered_ids|flashcard_state)\.json$")
+# A mistake key from before mistakes were keyed by gid (see utils.utils.convert_legacy_keys)
+_LEGACY_KEY_RE = re.compile(r"^day(\d+)_q(\d+)$")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS question_mistakes (
+    user TEXT NOT NULL,
+    scope TEXT NOT NULL,
+    gid INTEGER NOT NULL,
+    count INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (user, scope, gid)
+) WITHOUT ROWID;
+-- Mistakes keyed by day position, until they are converted to gids
+CREATE TABLE IF NOT EXISTS mistakes (
+    user TEXT NOT NULL,
+    scope TEXT NOT NULL,
+    day INTEGER NOT NULL,
+    question INTEGER NOT NULL,
+    count INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (user, scope, day, question)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS progress (
+    user TEXT NOT NULL,
+    scope TEXT NOT NULL,
+    round_key TEXT NOT NULL,
+    rounds INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (user, scope, round_key)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS answered (
+    user TEXT NOT NULL,
+    scope TEXT NOT NULL,
+    round_key TEXT NOT NULL,
+    question INTEGER NOT NULL,
+    seq INTEGER NOT NULL,
+    PRIMARY KEY (user, scope, round_key, question)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS flashcard_state (
+    user TEXT NOT NULL,
+    scope TEXT NOT NULL,
+    round_key TEXT NOT NULL,
+    state TEXT NOT NULL,
+    PRIMARY KEY (user, scope, round_key)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS documents (
+    user TEXT NOT NULL,
+    name TEXT NOT NULL,
+    body TEXT NOT NULL,
+    PRIMARY KEY (user, name)
+) WITHOUT ROWID;
+"""
+
+
+def parse_state_path(path):
+    """Maps a state file path to its (scope, kind) pair.
+
+    Files without a dedicated table are stored whole in `documents`, with
+    the file name (minus .json) as scope.
+    """
+    filename = os.path.basename(path)
+    match = _FILE_RE.match(filename)
+    if not match:
+        if not filename.endswith(".json"):
+            raise ValueError(f"Not a state file: {path}")
+        return filename[:-len(".json")], "document"
+    return match.group("scope"), match.group("kind")
+
+
+class SqliteStore:
+    """SQLite (WAL mode) backend with the same interface as JsonStore.
+
+    State files are addressed by their usual paths; the path only selects
+    the table (`kind`) and the `scope` ("day" or "bulk") of the rows. Rows
+    are partitioned by the current user (see utils.users).
+    """
+
+    def __init__(self, db_path, user=None):
+        self.db_path = db_path
+        self._fixed_user = user
+        self._local = threading.local()
+        directory = os.path.dirname(db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        conn = self._conn()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.executescript(SCHEMA)
+
+    @property
+    def user(self):
+        """The user rows are read and written for; defaults to the current user (and bank)."""
+        return self._fixed_user or state_owner()
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    # ─── Row <-> document mapping ────────────────────────────────────────
+    def _read(self, conn, scope, kind):
+        args = (self.user, scope)
+        if kind == "mistakes":
+            rows = conn.execute("SELECT gid, count FROM question_mistakes WHERE user=? AND scope=?", args)
+            data = {str(g): c for g, c in rows}
+            legacy = conn.execute("SELECT day, question, count FROM mistakes WHERE user=? AND scope=?", args)
+            data.update((f"day{d}_q{q}", c) for d, q, c in legacy)
+            return data
+        if kind == "progress":
+            rows = conn.execute("SELECT round_key, rounds FROM progress WHERE user=? AND scope=?", args)
+            return dict(rows.fetchall())
+        if kind == "answered_ids":
+            data = {}
+            rows = conn.execute(
+                "SELECT round_key, question FROM answered WHERE user=? AND scope=? ORDER BY round_key, seq", args)
+            for key, q in rows:
+                data.setdefault(key, []).append(q)
+            return data
+        if kind == "document":
+            row = conn.execute("SELECT body FROM documents WHERE user=? AND name=?", args).fetchone()
+            return json.loads(row[0]) if row else {}
+        rows = conn.execute("SELECT round_key, state FROM flashcard_state WHERE user=? AND scope=?", args)
+        return {k: json.loads(s) for k, s in rows}
+
+    def _write(self, conn, scope, kind, data):
+        if kind == "document":
+            conn.execute("INSERT OR REPLACE INTO documents VALUES (?, ?, ?)",
+                         (self.user, scope, json.dumps(data)))
+            return
+        table = {"mistakes": "question_mistakes", "progress": "progress",
+                 "answered_ids": "answered", "flashcard_state": "flashcard_state"}[kind]
+        conn.execute(f"DELETE FROM {table} WHERE user=? AND scope=?", (self.user, scope))
+        if kind == "mistakes":
+            conn.execute("DELETE FROM mistakes WHERE user=? AND scope=?", (self.user, scope))
+            rows, legacy = [], []
+            for key, count in data.items():
+                if key.isdigit():
+                    rows.append((self.user, scope, int(key), count))
+                else:
+                    match = _LEGACY_KEY_RE.match(key)
+                    if match:
+                        legacy.append((self.user, scope, int(match.group(1)), int(match.group(2)), count))
+            conn.executemany("INSERT INTO question_mistakes VALUES (?, ?, ?, ?)", rows)
+            conn.executemany("INSERT INTO mistakes VALUES (?, ?, ?, ?, ?)", legacy)
+        elif kind == "progress":
+            conn.executemany("INSERT INTO progress VALUES (?, ?, ?, ?)",
+                             [(self.user, scope, k, v) for k, v in data.items()])
+        elif kind == "answered_ids":
+            conn.executemany("INSERT OR IGNORE INTO answered VALUES (?, ?, ?, ?, ?)",
+                             [(self.user, scope, k, q, seq)
+                              for k, ids in data.items() for seq, q in enumerate(ids)])
+        else:
+            conn.executemany("INSERT INTO flashcard_state VALUES (?, ?, ?, ?)",
+                             [(self.user, scope, k, json.dumps(v)) for k, v in data.items()])
+
+    # ─── JsonStore interface ─────────────────────────────────────────────
+    def load(self, path, default=None):
+        scope, kind = parse_state_path(path)
+        data = self._read(self._conn(), scope, kind)
+        if not data and default is not None:
+            return copy.deepcopy(default)
+        return data
+
+    def save(self, path, data):
+        scope, kind = parse_state_path(path)
+        conn = self._conn()
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            self._write(conn, scope, kind, data)
+
+    def update(self, path, func, default=None):
+        scope, kind = parse_state_path(path)
+        conn = self._conn()
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            data = self._read(conn, scope, kind)
+            result = func(data)
+            self._write(conn, scope, kind, data)
+        return result
+
+    def increment(self, path, key, amount=1):
+        scope, kind = parse_state_path(path)
+        conn = self._conn()
+        if kind == "progress":
+            sql = ("INSERT INTO progress VALUES (?, ?, ?, ?) ON CONFLICT (user, scope, round_key) "
+                   "DO UPDATE SET rounds = rounds + excluded.rounds")
+            select = "SELECT rounds FROM progress WHERE user=? AND scope=? AND round_key=?"
+            args = (self.user, scope, key)
+        elif kind == "mistakes":
+            if not key.isdigit():
+                raise ValueError(f"Not a mistake key: {key}")
+            sql = ("INSERT INTO question_mistakes VALUES (?, ?, ?, ?) ON CONFLICT (user, scope, gid) "
+                   "DO UPDATE SET count = count + excluded.count")
+            select = "SELECT count FROM question_mistakes WHERE user=? AND scope=? AND gid=?"
+            args = (self.user, scope, int(key))
+        else:
+            def _inc(data):
+                data[key] = data.get(key, 0) + amount
+                return data[key]
+            return self.update(path, _inc)
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.execute(sql, args + (amount,))
+            return conn.execute(select, args).fetchone()[0]
+
+    def increment_many(self, path, counts):
+        scope, kind = parse_state_path(path)
+        if kind == "mistakes":
+            rows = []
+            for key, amount in counts.items():
+                if not key.isdigit():
+                    raise ValueError(f"Not a mistake key: {key}")
+                rows.append((self.user, scope, int(key), amount))
+            sql = ("INSERT INTO question_mistakes VALUES (?, ?, ?, ?) ON CONFLICT (user, scope, gid) "
+                   "DO UPDATE SET count = count + excluded.count")
+        elif kind == "progress":
+            rows = [(self.user, scope, key, amount) for key, amount in counts.items()]
+            sql = ("INSERT INTO progress VALUES (?, ?, ?, ?) ON CONFLICT (user, scope, round_key) "
+                   "DO UPDATE SET rounds = rounds + excluded.rounds")
+        else:
+            def _inc(data):
+                for key, amount in counts.items():
+                    data[key] = data.get(key, 0) + amount
+            self.update(path, _inc)
+            return
+        conn = self._conn()
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.executemany(sql, rows)
+
+    def set_value(self, path, key, value):
+        scope, kind = parse_state_path(path)
+        conn = self._conn()
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            if kind == "progress":
+                conn.execute("DELETE FROM progress WHERE user=? AND scope=? AND round_key=?",
+                             (self.user, scope, key))
+                if value is not None:
+                    conn.execute("INSERT INTO progress VALUES (?, ?, ?, ?)", (self.user, scope, key, value))
+            elif kind == "flashcard_state":
+                conn.execute("DELETE FROM flashcard_state WHERE user=? AND scope=? AND round_key=?",
+                             (self.user, scope, key))
+                if value is not None:
+                    conn.execute("INSERT INTO flashcard_state VALUES (?, ?, ?, ?)",
+                                 (self.user, scope, key, json.dumps(value)))
+            elif kind == "answered_ids":
+                conn.execute("DELETE FROM answered WHERE user=? AND scope=? AND round_key=?",
+                             (self.user, scope, key))
+                conn.executemany("INSERT OR IGNORE INTO answered VALUES (?, ?, ?, ?, ?)",
+                                 [(self.user, scope, key, q, seq) for seq, q in enumerate(value or [])])
+            else:
+                data = self._read(conn, scope, kind)
+                if value is None:
+                    data.pop(key, None)
+                else:
+                    data[key] = value
+                self._write(conn, scope, kind, data)
+
+    def append_item(self, path, key, item):
+        scope, kind = parse_state_path(path)
+        if kind != "answered_ids":
+            def _append(data):
+                items = data.setdefault(key, [])
+                if item not in items:
+                    items.append(item)
+            self.update(path, _append)
+            return
+        conn = self._conn()
+        conn.execute(
+            "INSERT OR IGNORE INTO answered SELECT ?, ?, ?, ?, COALESCE(MAX(seq) + 1, 0) "
+            "FROM answered WHERE user=? AND scope=? AND round_key=?",
+            (self.user, scope, key, item, self.user, scope, key))
+
+    def load_mistake_range(self, path, start, end):
+        scope, _ = parse_state_path(path)
+        rows = self._conn().execute(
+            "SELECT gid, count FROM question_mistakes WHERE user=? AND scope=? AND gid >= ? AND gid < ?",
+            (self.user, scope, start, end))
+        return {str(g): c for g, c in rows}
+
+    def clear_mistake_range(self, path, start, end):
+        scope, _ = parse_state_path(path)
+        self._conn().execute("DELETE FROM question_mistakes WHERE user=? AND scope=? AND gid >= ? AND gid < ?",
+                             (self.user, scope, start, end))
+
+    def flush(self, path=None):
+        """Every statement is committed immediately; nothing to do."""
+
+    def invalidate(self, path=None):
+        pass
+
+
+def migrate_json_files(db_path, json_paths, user=DEFAULT_USER):
+    """Imports existing JSON state files into the database (one-shot)."""
+    db = SqliteStore(db_path, user=user)
+    imported = []
+    for path in json_paths:
+        try:
+            parse_state_path(path)
+        except ValueError:
+            continue
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        db.save(path, data)
+        imported.append(path)
+    return imported
+
+
+def state_shards():
+    """Yields (user, bank, JSON state files) for every shard under the data directories.
+
+    The layout is the one of utils.users.shard_path:
+    *_practice/data[/banks/<bank>][/users/<user>]/*.json
+    """
+    for bank_dir in [""] + sorted(glob.glob(f"*_practice/data/{BANKS_DIR}/*/")):
+        bank = os.path.basename(os.path.normpath(bank_dir)) if bank_dir else DEFAULT_BANK
+        roots = [bank_dir] if bank_dir else ["day_practice/data/", "bulk_practice/data/"]
+        files = sorted(p for root in roots for p in glob.glob(root + "*.json"))
+        if files:
+            yield DEFAULT_USER, bank, files
+        pattern = f"{bank_dir}{USERS_DIR}/*/" if bank_dir else f"*_practice/data/{USERS_DIR}/*/"
+        users = {}
+        for user_dir in glob.glob(pattern):
+            user = os.path.basename(os.path.normpath(user_dir))
+            users.setdefault(user, []).extend(glob.glob(user_dir + "*.json"))
+        for user, user_files in sorted(users.items()):
+            yield user, bank, sorted(user_files)
+
+
+if __name__ == "__main__":
+    # python -m utils.sqlite_store [db_path]
+    target = sys.argv[1] if len(sys.argv) > 1 else os.environ.get("STUDY_DB", DEFAULT_DB_PATH)
+    for user, bank, files in state_shards():
+        owner = state_owner(user, bank)
+        for p in migrate_json_files(target, files, user=owner):
+            print(f"Imported {p} for {owner}")
@@ -0,0 +1,274 @@
+import atexit
+import copy
+import json
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+
+from utils import profiling
+from utils.users import shard_path
+
+FLUSH_INTERVAL = 2.0
+MAX_DOCUMENTS = 256
+DEFAULT_DB_PATH = "data/study.db"
+
+_MISSING = object()
+_known_dirs = set()  # shard directories that exist (see JsonStore._resolve)
+
+
+def gid_in_range(key, start, end):
+    """Whether a mistake key (a gid, see utils.question_bank) lies in start..end-1."""
+    return key.isdigit() and start <= int(key) < end
+
+
+def atomic_write_json(path, data):
+    """Writes `data` to a temp file next to `path` and renames it into place."""
+    directory = os.path.dirname(path) or "."
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".tmp_", suffix=".json")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(data, f, indent=2)
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+def atomic_write_bytes(path, data):
+    """Binary counterpart of atomic_write_json."""
+    directory = os.path.dirname(path) or "."
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".tmp_")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+class JsonStore:
+    """In-memory write-behind cache for the JSON state files.
+
+    Every path is first mapped to the current user's shard (see
+    utils.users), so a request only ever touches its own small files.
+
+    Cached documents are immutable snapshots: writers build a modified
+    copy and publish it, so reads of a resident document take no lock.
+    Writes are coalesced into one atomic rewrite per file every
+    `flush_interval` seconds (and at interpreter exit), performed outside
+    the write lock. At most `max_documents` shards stay resident; evicting
+    a dirty one keeps its snapshot queued until the next flush.
+    """
+
+    def __init__(self, flush_interval=FLUSH_INTERVAL, max_documents=MAX_DOCUMENTS):
+        self.flush_interval = flush_interval
+        self.max_documents = max_documents
+        self._docs = OrderedDict()
+        self._pending = {}
+        self._inflight = {}
+        self._lock = threading.RLock()
+        self._flush_lock = threading.Lock()
+        self._timer = None
+
+    # ─── Cache management ────────────────────────────────────────────────
+    def _get(self, path):
+        """Returns the snapshot of `path` (or _MISSING), loading it on a miss."""
+        data = self._docs.get(path)
+        if data is not None:
+            try:
+                self._docs.move_to_end(path)
+            except KeyError:
+                pass
+            return data
+        with self._lock:
+            data = self._docs.get(path)
+            if data is not None:
+                return data
+            # Unflushed snapshots are newer than the file on disk
+            data = self._pending.get(path, self._inflight.get(path))
+            if data is None:
+                if os.path.exists(path):
+                    with open(path, "r", encoding="utf-8") as f:
+                        data = json.load(f)
+                        if profiling.ENABLED:
+                            profiling.add_bytes("read", f.tell())
+                else:
+                    data = _MISSING
+            self._publish(path, data)
+            return data
+
+    def _publish(self, path, data):
+        """Installs a new snapshot; caller holds the lock."""
+        self._docs[path] = data
+        self._docs.move_to_end(path)
+        while len(self._docs) > self.max_documents:
+            self._docs.popitem(last=False)
+
+    def _mark_dirty(self, path, data):
+        self._pending[path] = data
+        if self._timer is None and self.flush_interval is not None:
+            self._timer = threading.Timer(self.flush_interval, self._on_timer)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def _on_timer(self):
+        with self._lock:
+            self._timer = None
+        self.flush()
+
+    @staticmethod
+    def _resolve(path, create=False):
+        shard = shard_path(path)
+        directory = os.path.dirname(shard)
+        # Directories are never removed while the app runs, so each one is
+        # checked (or created) once instead of on every write
+        if create and directory not in _known_dirs:
+            if shard != path:
+                os.makedirs(directory, exist_ok=True)
+            if not os.path.exists(directory):
+                raise FileNotFoundError(f"Directory does not exist: {os.path.dirname(path)}")
+            _known_dirs.add(directory)
+        return shard
+
+    # ─── Public API ──────────────────────────────────────────────────────
+    def load(self, path, default=None):
+        """Returns a private copy of the current user's document at `path`."""
+        data = self._get(self._resolve(path))
+        if data is _MISSING:
+            return copy.deepcopy(default) if default is not None else {}
+        return copy.deepcopy(data)
+
+    def save(self, path, data):
+        path = self._resolve(path, create=True)
+        snapshot = copy.deepcopy(data)
+        with self._lock:
+            self._publish(path, snapshot)
+            self._mark_dirty(path, snapshot)
+
+    def update(self, path, func, default=None):
+        """Applies `func` to a shallow copy of the document and publishes the result.
+
+        Unlike a load/save pair, concurrent updates cannot overwrite each other.
+        Readers may still hold the previous snapshot, so `func` replaces
+        nested values instead of mutating them.
+        """
+        path = self._resolve(path, create=True)
+        with self._lock:
+            data = self._get(path)
+            if data is _MISSING:
+                data = copy.deepcopy(default) if default is not None else {}
+            else:
+                data = copy.copy(data)
+            result = func(data)
+            self._publish(path, data)
+            self._mark_dirty(path, data)
+            return copy.deepcopy(result)
+
+    def increment(self, path, key, amount=1):
+        """Adds `amount` to the counter `key` and returns the new value."""
+        def _inc(data):
+            data[key] = data.get(key, 0) + amount
+            return data[key]
+        return self.update(path, _inc)
+
+    def increment_many(self, path, counts):
+        """Adds every {key: amount} in `counts` under a single update."""
+        def _inc(data):
+            for key, amount in counts.items():
+                data[key] = data.get(key, 0) + amount
+        self.update(path, _inc)
+
+    def set_value(self, path, key, value):
+        """Sets (or with value=None, removes) one top-level entry."""
+        def _set(data):
+            if value is None:
+                data.pop(key, None)
+            else:
+                data[key] = copy.deepcopy(value)
+        self.update(path, _set)
+
+    def append_item(self, path, key, item):
+        """Appends `item` to the list under `key` unless it is already there."""
+        def _append(data):
+            items = data.get(key, [])
+            if item not in items:
+                data[key] = items + [item]
+        self.update(path, _append)
+
+    def load_mistake_range(self, path, start, end):
+        """Returns the mistake counters of gids start..end-1 (e.g. one day)."""
+        data = self._get(self._resolve(path))
+        if data is _MISSING:
+            return {}
+        return {k: v for k, v in data.items() if gid_in_range(k, start, end)}
+
+    def clear_mistake_range(self, path, start, end):
+        def _clear(mistakes):
+            for k in [k for k in mistakes if gid_in_range(k, start, end)]:
+                del mistakes[k]
+        self.update(path, _clear)
+
+    def flush(self, path=None):
+        """Writes pending snapshots (or just the current user's `path`) to disk now."""
+        with self._flush_lock:
+            with self._lock:
+                if path is None:
+                    batch, self._pending = self._pending, {}
+                else:
+                    path = shard_path(path)
+                    batch = {path: self._pending.pop(path)} if path in self._pending else {}
+                self._inflight = batch
+            written = set()
+            try:
+                for p, data in batch.items():
+                    if data is not _MISSING:
+                        atomic_write_json(p, data)
+                        if profiling.ENABLED:
+                            profiling.add_bytes("flushed", os.path.getsize(p))
+                    written.add(p)
+            finally:
+                with self._lock:
+                    # Requeue whatever a failed write left behind
+                    for p, data in batch.items():
+                        if p not in written:
+                            self._pending.setdefault(p, data)
+                    self._inflight = {}
+
+    def invalidate(self, path=None):
+        """Drops cached documents so the next load re-reads the file."""
+        self.flush(path)
+        with self._lock:
+            if path is None:
+                self._docs.clear()
+            else:
+                self._docs.pop(shard_path(path), None)
+
+
+store = JsonStore()
+atexit.register(store.flush)
+
+
+def open_store():
+    """Returns the configured storage backend.
+
+    Set STUDY_STORAGE=sqlite (and optionally STUDY_DB) to use the SQLite
+    backend instead of the JSON files. Writes go through a background
+    writer (utils.async_store) unless STUDY_ASYNC_WRITES=0.
+    """
+    if os.environ.get("STUDY_STORAGE", "json").lower() == "sqlite":
+        from utils.sqlite_store import SqliteStore
+        backend = SqliteStore(os.environ.get("STUDY_DB", DEFAULT_DB_PATH))
+    else:
+        backend = store
+    if os.environ.get("STUDY_ASYNC_WRITES", "1").lower() in ("0", "false", "no"):
+        return backend
+    from utils.async_store import wrap_async
+    return wrap_async(backend)
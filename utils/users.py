@@ -0,0 +1,83 @@
+import os
+import re
+import uuid
+from contextvars import ContextVar
+from functools import lru_cache
+
+DEFAULT_USER = "default"
+USERS_DIR = "users"
+DEFAULT_BANK = "default"
+BANKS_DIR = "banks"
+
+_current_user = ContextVar("current_user", default=DEFAULT_USER)
+_current_bank = ContextVar("current_bank", default=DEFAULT_BANK)
+_UNSAFE_RE = re.compile(r"[^A-Za-z0-9_-]")
+
+
+def sanitize_user_id(user_id):
+    """Reduces a user id or session token to a safe directory name."""
+    cleaned = _UNSAFE_RE.sub("", str(user_id or ""))[:64]
+    return cleaned or DEFAULT_USER
+
+
+def new_session_token():
+    return uuid.uuid4().hex
+
+
+def set_current_user(user_id):
+    """Binds all state reads and writes of the current script run to `user_id`."""
+    _current_user.set(sanitize_user_id(user_id))
+
+
+def get_current_user():
+    return _current_user.get()
+
+
+def set_current_bank(bank_id):
+    """Binds all state reads and writes of the current script run to question bank `bank_id`."""
+    _current_bank.set(sanitize_user_id(bank_id) if bank_id else DEFAULT_BANK)
+
+
+def get_current_bank():
+    return _current_bank.get()
+
+
+def get_namespace():
+    """The (user, bank) whose state is currently read and written."""
+    return _current_user.get(), _current_bank.get()
+
+
+def set_namespace(namespace):
+    user, bank = namespace
+    _current_user.set(user)
+    _current_bank.set(bank)
+
+
+def state_owner(user=None, bank=None):
+    """One string for the given (or current) user and bank, e.g. to partition database rows."""
+    user = user or _current_user.get()
+    bank = bank or _current_bank.get()
+    return user if bank == DEFAULT_BANK else f"{user}@{bank}"
+
+
+def shard_path(path, user=None, bank=None):
+    """Maps a global state file path to the given (or current) user's and bank's shard.
+
+    day_practice/data/day_mistakes.json -> day_practice/data/users/<user>/day_mistakes.json
+    (bank "aws")                        -> day_practice/data/banks/aws/users/<user>/day_mistakes.json
+
+    The default user and bank keep the original path so existing data stays readable.
+    """
+    return _shard_path(path, user or _current_user.get(), bank or _current_bank.get())
+
+
+@lru_cache(maxsize=4096)
+def _shard_path(path, user, bank):
+    if user == DEFAULT_USER and bank == DEFAULT_BANK:
+        return path
+    directory, filename = os.path.split(path)
+    if bank != DEFAULT_BANK:
+        directory = os.path.join(directory, BANKS_DIR, bank)
+    if user != DEFAULT_USER:
+        directory = os.path.join(directory, USERS_DIR, user)
+    return os.path.join(directory, filename)
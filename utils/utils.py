@@ -1,39 +1,152 @@
 import json
-import os
+from utils.store import gid_in_range, open_store
+from utils import profiling
+from utils import attempts
+from utils.question_bank import get_question_bank, legacy_key_gid
+from utils.profiling import timed
 
-def load_questions(path="questions.json"):
-    with open(path, "r", encoding="utf-8") as f:
-        return json.load(f)
+store = open_store()
+
+# Mistakes are keyed by gid (see utils.question_bank). Mistakes saved before
+# were keyed by day position ("day3_q7") and are converted once per learner
+STATE_VERSION_FILE = "day_practice/data/state_version.json"
+GID_KEYS_VERSION = 2
+
+@timed()
+def load_questions(path=None):
+    """Returns the shared bank for `path`; large banks are read lazily (see utils.bank_loader)."""
+    return get_question_bank(path)
 
 def get_day_questions(questions, day, questions_per_day=40):
+    if hasattr(questions, "day_questions"):
+        # QuestionBank: use its precomputed day partition
+        return questions.day_questions(day)
     start = (day - 1) * questions_per_day
     end = start + questions_per_day
     return questions[start:end]
 
+def _with_pending_attempts(path, data):
+    """Adds answers that are in the attempt log but not compacted into `path` yet."""
+    counts, answered = attempts.pending(path)
+    if not counts and not answered:
+        return data
+    # A shallow copy: the store's reads are private, but `data` may be the caller's default
+    data = dict(data) if data is not None else {}
+    for key, amount in counts.items():
+        data[key] = data.get(key, 0) + amount
+    for key, positions in answered.items():
+        items = data.get(key, [])
+        data[key] = items + [p for p in positions if p not in items]
+    return data
+
+def _count_written(path):
+    """Counts the document as a write left it, in the script run that made the write.
+
+    The file itself is written later on the writer or flush thread (see
+    utils.async_store and utils.store), outside of any run.
+    """
+    if profiling.ENABLED:
+        profiling.add_bytes("written", len(json.dumps(store.load(path, {}), indent=2).encode("utf-8")))
+
+def _compact_before_overwrite(path):
+    """Folds pending attempts first, so a reset is not undone by a later compaction."""
+    if path in attempts.FOLDED_FILES:
+        attempts.compact()
+
+@timed()
 def save_json(path, data):
-    if not os.path.exists(os.path.dirname(path)):
-        raise FileNotFoundError(f"Directory does not exist: {os.path.dirname(path)}")
-    with open(path, "w", encoding="utf-8") as f:
-        json.dump(data, f, indent=2)
+    _compact_before_overwrite(path)
+    store.save(path, data)
+    _count_written(path)
 
+@timed()
 def load_json(path, default=None):
-    if os.path.exists(path):
-        with open(path, "r", encoding="utf-8") as f:
-            return json.load(f)
-    return default if default is not None else {}
+    return _with_pending_attempts(path, store.load(path, default))
+
+@timed()
+def increment_json_counter(path, key, amount=1):
+    """Increments one counter in a JSON object file without a load/save round trip."""
+    value = store.increment(path, key, amount)
+    _count_written(path)
+    return value
+
+@timed()
+def set_json_value(path, key, value):
+    """Sets (or with value=None, removes) one top-level entry of a JSON object file."""
+    _compact_before_overwrite(path)
+    store.set_value(path, key, value)
+    _count_written(path)
+
+@timed()
+def load_mistake_range(path, start, end):
+    """Returns the mistake counters of gids start..end-1 (e.g. one day)."""
+    mistakes = store.load_mistake_range(path, start, end)
+    counts, _ = attempts.pending(path)
+    for key, amount in counts.items():
+        if gid_in_range(key, start, end):
+            mistakes[key] = mistakes.get(key, 0) + amount
+    return mistakes
+
+@timed()
+def load_day_mistakes_by_gid(bank, path, day):
+    """Returns {gid: count} for the questions of `day`.
 
-def clear_day_mistakes(filename, day):
-    """Clears mistakes for a specific day."""
+    Near-duplicates are counted for their canonical question (see
+    utils.dedup), also when one of them is on another day.
+    """
+    start, end = bank.partition.day_range(day)
+    by_gid = {}
+    for alias_day in bank.alias_days(day):
+        mistakes = load_mistake_range(path, *bank.partition.day_range(alias_day))
+        for gid, count in bank.mistakes_by_gid(mistakes).items():
+            if start <= gid < end:
+                by_gid[gid] = by_gid.get(gid, 0) + count
+    return by_gid
+
+def store_stats():
+    """Queue depth and write latency of the background writer, if one is used."""
+    stats = getattr(store, "stats", None)
+    return stats() if stats else {}
+
+@timed()
+def flush_json(path=None):
+    """Forces pending writes to disk."""
+    store.flush(path)
+
+@timed()
+def clear_day_mistakes(filename, day, bank):
+    """Clears mistakes for a specific day.
+
+    Exactly the mistakes shown for the day are cleared: those of
+    near-duplicates on other days too, but not those of this day's
+    duplicates of another day's questions (see load_day_mistakes_by_gid).
+    """
     try:
-        mistakes = load_json(filename, {})
-        day_prefix = f"day{day}_q"
-        filtered_mistakes = {k: v for k, v in mistakes.items() if not k.startswith(day_prefix)}
-        save_json(filename, filtered_mistakes)
+        _compact_before_overwrite(filename)
+        start, end = bank.partition.day_range(day)
+        if bank.own_mistakes_only(day):
+            # No aliases involved: one range delete (indexed in SQLite)
+            store.clear_mistake_range(filename, start, end)
+            _count_written(filename)
+            return True
+        doomed = set()
+        for alias_day in bank.alias_days(day):
+            for key in store.load_mistake_range(filename, *bank.partition.day_range(alias_day)):
+                if start <= bank.canonical(int(key)) < end:
+                    doomed.add(key)
+
+        def _clear(mistakes):
+            for key in doomed:
+                mistakes.pop(key, None)
+        if doomed:
+            store.update(filename, _clear)
+            _count_written(filename)
         return True
     except Exception as e:
         print(f"Error clearing mistakes for Day {day}: {e}")
         return False
 
+@timed()
 def clear_bulk_mistakes(filename):
     """Clears the bulk mistakes file. Creates an empty one if not found."""
     try:
@@ -41,4 +154,26 @@ def clear_bulk_mistakes(filename):
         return True
     except Exception as e:
         print(f"Error clearing bulk mistakes: {e}")
-        return False
\ No newline at end of file
+        return False
+
+def _gid_keys(mistakes):
+    for key in [k for k in mistakes if not k.isdigit()]:
+        count = mistakes.pop(key)
+        gid = legacy_key_gid(key)
+        if gid is not None:
+            mistakes[str(gid)] = mistakes.get(str(gid), 0) + count
+
+@timed()
+def convert_legacy_keys():
+    """Re-keys the current learner's saved mistakes from day positions to gids, once.
+
+    Returns whether the learner's state had not been converted yet.
+    """
+    if store.load(STATE_VERSION_FILE, {}).get("version", 1) >= GID_KEYS_VERSION:
+        return False
+    for path in sorted(set(attempts.MISTAKE_FILES.values())):
+        if any(not key.isdigit() for key in store.load(path, {})):
+            store.update(path, _gid_keys)
+            _count_written(path)
+    store.set_value(STATE_VERSION_FILE, "version", GID_KEYS_VERSION)
+    return True